@@ -7,14 +7,16 @@ import keras.backend as K
 from keras.models import Model
 
 from rl.agents.rlagent import RLAgent
-from rl.util import *
+from rl.utils.memory import zeroed_observation
+from rl.utils.printer import print_status
+from rl.utils.workers import ReplicaPool
 
 class CEMAgent(RLAgent):
     """Write me
     """
     def __init__(self, model, nb_actions, memory, batch_size=50, nb_steps_warmup=1000,
                  train_interval=50, elite_frac=0.05, memory_interval=1, theta_init=None,
-                 noise_decay_const=0.0, noise_ampl=0.0, **kwargs):
+                 noise_decay_const=0.0, noise_ampl=0.0, processor=None, **kwargs):
         super(CEMAgent, self).__init__(**kwargs)
 
         # Parameters.
@@ -37,6 +39,7 @@ class CEMAgent(RLAgent):
         # Related objects.
         self.memory = memory
         self.model = model
+        self.processor = processor
         self.shapes = [w.shape for w in model.get_weights()]
         self.sizes = [w.size for w in model.get_weights()]
         self.num_weights = sum(self.sizes)
@@ -91,7 +94,7 @@ class CEMAgent(RLAgent):
 
         action = self.model.predict_on_batch(batch).flatten()
         if stochastic or self.training:
-            return np.random.choice(np.arange(self.nb_actions), p=np.exp(action) / np.sum(np.exp(action)))
+            return self.random_state.choice(self.nb_actions, p=np.exp(action) / np.sum(np.exp(action)))
         return np.argmax(action)
 
     def update_theta(self,theta):
@@ -108,11 +111,70 @@ class CEMAgent(RLAgent):
     def choose_weights(self):
         mean = self.theta[:self.num_weights]
         std = self.theta[self.num_weights:]
-        weights_flat = std * np.random.randn(self.num_weights) + mean
+        weights_flat = std * self.random_state.standard_normal(self.num_weights) + mean
 
         sampled_weights = self.get_weights_list(weights_flat)
         self.model.set_weights(sampled_weights)
 
+    def sample_population(self):
+        """Sample `batch_size` flat weight vectors from the current distribution, as a `(batch_size, num_weights)` array"""
+        mean = self.theta[:self.num_weights]
+        std = self.theta[self.num_weights:]
+        return std * self.random_state.standard_normal((self.batch_size, self.num_weights)) + mean
+
+    def update_population(self, population, reward_totals):
+        """
+        Fit the distribution on the elite of an evaluated population
+
+        :param population: The flat weights, as a `(batch_size, num_weights)` array
+        :param reward_totals: The total reward of each weight vector
+        :return: The mean reward of the elite
+        """
+        reward_totals = np.asarray(reward_totals)
+        best_idx = np.argpartition(reward_totals, -self.num_best)[-self.num_best:]
+        best = population[best_idx]
+
+        best_seen_idx = best_idx[np.argmax(reward_totals[best_idx])]
+        if reward_totals[best_seen_idx] > self.best_seen[0]:
+            self.best_seen = (reward_totals[best_seen_idx], population[best_seen_idx])
+
+        min_std = self.noise_ampl * np.exp(-self.step * self.noise_decay_const)
+        self.update_theta(np.hstack((np.mean(best, axis=0), np.std(best, axis=0) + min_std)))
+        return np.mean(reward_totals[best_idx])
+
+    def fit_population(self, replica_factory, nb_generations, nb_processes=None, nb_max_episode_steps=None, start_method=None):
+        """
+        Train by generations: Each generation samples `batch_size` weight vectors, evaluates them in parallel during one episode each,
+        and fits the distribution on their elite.
+        The actions are selected as by :meth:`forward`, with the processor of the agent and the window length of its memory.
+
+        :param replica_factory: Picklable function without arguments, returning a new `(env, model)` tuple, `model` having the same architecture as the agent's one
+        :param int nb_generations: Number of generations
+        :param int nb_processes: Number of worker processes, each holding one replica. Defaults to the number of cores.
+        :param int nb_max_episode_steps: Maximal number of steps of an episode
+        :param str start_method: Start method of the worker processes (see :class:`rl.utils.workers.ReplicaPool`)
+        :return: The mean reward of the elite of each generation
+        """
+        self.training = True
+        elite_rewards = []
+        with ReplicaPool(replica_factory, nb_processes=nb_processes, start_method=start_method) as pool:
+            for generation in range(1, nb_generations + 1):
+                population = self.sample_population()
+                # Seed each evaluation, since the workers share the random state they inherited
+                seeds = self.random_state.integers(2**31, size=self.batch_size)
+                window_length = getattr(self.memory, "window_length", 1)
+                results = pool.map(evaluate_weights, [(self.get_weights_list(weights), nb_max_episode_steps, seed, self.processor, window_length)
+                                                      for (weights, seed) in zip(population, seeds)])
+                reward_totals, episode_steps = np.array(results).T
+
+                self.episode += self.batch_size
+                self.step += int(np.sum(episode_steps))
+                elite_rewards.append(self.update_population(population, reward_totals))
+                print_status("Generation {}/{}: mean best reward: {:.3f}".format(generation, nb_generations, elite_rewards[-1]),
+                             terminal=(generation == nb_generations))
+        self._on_train_end()
+        return elite_rewards
+
     def forward(self, observation):
         # Select an action.
         state = self.memory.get_recent_state(observation)
@@ -148,21 +210,9 @@ class CEMAgent(RLAgent):
 
             if self.step > self.nb_steps_warmup and self.episode % self.train_interval == 0:
                 params, reward_totals = self.memory.sample(self.batch_size)
-                best_idx = np.argsort(np.array(reward_totals))[-self.num_best:]
-                best = np.vstack([params[i] for i in best_idx])
-
-                if reward_totals[best_idx[-1]] > self.best_seen[0]:
-                    self.best_seen = (reward_totals[best_idx[-1]], params[best_idx[-1]])
-
-                metrics = [np.mean(np.array(reward_totals)[best_idx])]
+                metrics = [self.update_population(np.array(params), reward_totals)]
                 if self.processor is not None:
                     metrics += self.processor.metrics
-                min_std = self.noise_ampl * np.exp(-self.step * self.noise_decay_const)
-
-                mean = np.mean(best, axis=0)
-                std = np.std(best, axis=0) + min_std
-                new_theta = np.hstack((mean, std))
-                self.update_theta(new_theta)
             self.choose_weights()
             self.episode += 1
         return metrics
@@ -176,3 +226,42 @@ class CEMAgent(RLAgent):
         if self.processor is not None:
             names += self.processor.metrics_names[:]
         return names
+
+
+def evaluate_weights(replica, args):
+    """
+    Run one episode with the given weights, in a worker of :func:`CEMAgent.fit_population`
+
+    :param replica: An `(env, model)` tuple
+    :param args: A `(weights, nb_max_episode_steps, seed, processor, window_length)` tuple
+    :return: The total reward and the number of steps of the episode
+    """
+    env, model = replica
+    weights, nb_max_episode_steps, seed, processor, window_length = args
+    random_state = np.random.RandomState(seed)
+    model.set_weights(weights)
+
+    observation = env.reset()
+    # Last observations of the episode, stacked as by the memory of the agent
+    recent_observations = deque(maxlen=window_length)
+    reward_total = 0.
+    episode_step = 0
+    done = False
+    while not done:
+        recent_observations.append(observation)
+        state = [zeroed_observation(observation)] * (window_length - len(recent_observations)) + list(recent_observations)
+        batch = np.array([state])
+        if processor is not None:
+            batch = processor.process_state_batch(batch)
+        action = model.predict_on_batch(batch).flatten()
+        # Sample the action as CEMAgent.select_action does during training
+        probabilities = np.exp(action) / np.sum(np.exp(action))
+        action = random_state.choice(len(probabilities), p=probabilities)
+        if processor is not None:
+            action = processor.process_action(action)
+        observation, reward, done, _ = env.step(action)
+        reward_total += reward
+        episode_step += 1
+        if nb_max_episode_steps is not None and episode_step >= nb_max_episode_steps:
+            done = True
+    return (reward_total, episode_step)
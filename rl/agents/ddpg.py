@@ -1,5 +1,6 @@
 from __future__ import division
 import os
+import timeit
 
 import numpy as np
 import tensorflow as tf
@@ -10,7 +11,9 @@ from rl.utils.model import clone_model, get_soft_target_model_ops
 from rl.utils.numerics import gradient_inverter, huber_loss
 from rl.memory import Experience
 from rl.agents.rlagent import RLAgent
-from rl.utils.printer import print_warning
+from rl.utils.printer import print_warning, print_status
+from rl.utils.checkpoint import CheckpointStore
+from rl.utils.metrics import MetricsRegistry, SCALAR, PER_LAYER, to_summary
 
 # Whether to use Keras inference engine
 USE_KERAS_INFERENCE = False
@@ -30,15 +33,25 @@ class DDPGAgent(RLAgent):
     :param memory: The memory object
     :type memory: :class:`rl.memory.Memory`
     :param float gamma: Discount factor
+    :param int n_step: Number of steps of the returns used as critic targets, truncated at the end of the episodes.
+        With `n_step > 1`, the memory must implement :meth:`rl.memory.Memory.sample_nstep`.
     :param int batch_size: Size of the minibatches
     :param int train_interval: Train only at multiples of this number
-    :param int memory_interval: Add experiences to memory only at multiples of this number
+    :param int memory_interval: Add experiences to memory only at multiples of this number. Must be 1 with `n_step > 1`.
     :param delta_clip: Delta to which the rewards are clipped (via Huber loss, see https://github.com/devsisters/DQN-tensorflow/issues/16)
     :param random_process: The noise used to perform exploration
+    :param param_noise: Perform exploration with a perturbed copy of the actor, whose weights are resampled at each episode (see https://arxiv.org/abs/1706.01905)
+    :type param_noise: :class:`rl.random.AdaptiveParameterNoise`
     :param custom_model_objects:
     :param float target_critic_update: Target critic update factor
     :param float target_actor_update: Target actor update factor
+    :param int target_update_interval: Perform the soft updates of the target networks every `target_update_interval` trainings of the controllers
+    :param float polyak_actor: If set, maintain an average of the actor, with this decay, used instead of the actor when not training
+    :param metrics_costs: Cost classes of the metrics computed during training (see :class:`rl.utils.metrics.MetricsRegistry`).
+        By default, only the losses and the global gradient norms are fetched with the train ops, and the global weight norms every 100 steps.
     :param bool invert_gradients: Use gradient inverting as defined in https://arxiv.org/abs/1511.04143
+    :param int checkpoint_memory_budget: Number of bytes of checkpoints kept in memory, the others being spilled to disk
+        (see :class:`rl.utils.checkpoint.CheckpointStore`). If None, all the checkpoints are kept in memory.
     """
 
     def __init__(
@@ -48,6 +61,7 @@ class DDPGAgent(RLAgent):
             env,
             memory,
             gamma=.99,
+            n_step=1,
             batch_size=32,
             train_interval=1,
             memory_interval=1,
@@ -62,6 +76,11 @@ class DDPGAgent(RLAgent):
             gradient_inverter_max=1.,
             actor_reset_threshold=0.3,
             reset_controlers=False,
+            param_noise=None,
+            checkpoint_memory_budget=None,
+            target_update_interval=1,
+            polyak_actor=None,
+            metrics_costs=(SCALAR, ),
             **kwargs):
 
         if custom_model_objects is None:
@@ -78,6 +97,10 @@ class DDPGAgent(RLAgent):
             raise ValueError(
                 'Critic "{}" does not have enough inputs. The critic must have at exactly two inputs, one for the action and one for the observation.'.
                 format(critic))
+        if n_step > 1 and memory_interval > 1:
+            raise ValueError(
+                'n-step returns need consecutive experiences in the memory, they are not available with a memory_interval of {}.'.
+                format(memory_interval))
 
         super(DDPGAgent, self).__init__(name="ddpg", **kwargs)
 
@@ -91,12 +114,20 @@ class DDPGAgent(RLAgent):
         self.actions_low = env.action_space.low
         self.actions_high = env.action_space.high
         self.random_process = random_process
+        self.param_noise = param_noise
         self.delta_clip = delta_clip
         self.gamma = gamma
+        self.n_step = n_step
         self.target_critic_update = process_parameterization_variable(
             target_critic_update)
         self.target_actor_update = process_parameterization_variable(
             target_actor_update)
+        self.target_update_interval = target_update_interval
+        self.polyak_actor = polyak_actor
+        # Number of trainings of the controllers
+        self.nb_fits = 0
+        # Metrics computed by the last training of a controller
+        self.step_metrics = {}
         self.batch_size = batch_size
         self.train_interval = train_interval
         self.memory_interval = memory_interval
@@ -112,6 +143,11 @@ class DDPGAgent(RLAgent):
         self.actor = actor
         self.critic = critic
         self.memory = memory
+        # Episode of the last experience added to the memory
+        self.memory_episode = None
+        # Named checkpoints of the weights
+        self.checkpoints = CheckpointStore(memory_budget=checkpoint_memory_budget)
+        self.metrics_registry = MetricsRegistry(enabled_costs=metrics_costs)
 
         # State.
         self.compiled = False
@@ -137,24 +173,24 @@ class DDPGAgent(RLAgent):
 
         self.compile_actor()
         self.compile_critic()
+        if self.param_noise is not None:
+            self.compile_param_noise()
+        self.compile_restore_ops()
 
-        # Collect summaries directly from variables
-        for (var_name, variable) in self.variables.items():
-            self.summary_variables[var_name] = (tf.summary.scalar(
-                var_name, variable))
-        # Special selections of summary variables
-        # Critic
-        self.critic_summaries = [
-            value for (key, value) in self.summary_variables.items()
-            if (key.startswith("critic/") or key.startswith("target_critic/"))
-        ]
-        # Actor
-        # No need to collect the actor's loss, since we already have actor/objective
-        self.actor_summaries = [
-            value for (key, value) in self.summary_variables.items()
-            if (key.startswith("actor/") and not key == ("actor/loss")
-                or key.startswith("target_actor/"))
-        ]
+        # Soft updates, run together
+        self.soft_update_ops = []
+        if self.target_actor_update < 1.:
+            self.soft_update_ops.append(self.target_actor_train_op)
+        if self.target_critic_update < 1.:
+            self.soft_update_ops.append(self.target_critic_train_op)
+        if self.polyak_actor is not None:
+            self.averaged_actor = clone_model(self.actor, self.custom_model_objects)
+            self.soft_update_ops.append(get_soft_target_model_ops(
+                self.averaged_actor.weights, self.actor.weights,
+                self.polyak_actor))
+        self.compile_action_outputs()
+
+        self.register_metrics()
 
         # Initialize the remaining variables
         # FIXME: Use directly Keras backend
@@ -175,7 +211,7 @@ class DDPGAgent(RLAgent):
         # self.session.run(tf.global_variables_initializer())
 
         # Save the initial values of the networks
-        self.checkpoint()
+        self.checkpoint("initial")
 
         self.compiled = True
 
@@ -241,13 +277,48 @@ class DDPGAgent(RLAgent):
         target_actor_norms = [
             tf.norm(weight) for weight in self.target_actor.trainable_weights
         ]
-        for var, norm in zip(self.target_critic.trainable_weights,
+        for var, norm in zip(self.target_actor.trainable_weights,
                              target_actor_norms):
             var_name = "target_actor/{}/norm".format(var.name)
             self.variables[var_name] = norm
         self.variables["target_actor/norm"] = tf.reduce_sum(
             target_actor_norms)
 
+    def compile_action_outputs(self):
+        """Create the action tensors of the actors used to act, once, instead of calling the models at each step"""
+        self.variables["actor/output"] = self.actor(self.variables["state"])
+        if self.param_noise is not None:
+            self.variables["perturbed_actor/output"] = self.perturbed_actor(self.variables["state"])
+        if self.polyak_actor is not None:
+            self.variables["averaged_actor/output"] = self.averaged_actor(self.variables["state"])
+
+    def compile_param_noise(self):
+        """Create the perturbed actor, and the in-graph ops resampling its weights around the actor's ones"""
+        self.perturbed_actor = clone_model(self.actor, self.custom_model_objects)
+        self.perturbed_actor.compile(optimizer='sgd', loss='mse')
+
+        self.param_noise_stddev = tf.placeholder(
+            dtype=tf.float32, shape=(), name="param_noise_stddev")
+        trainable_weights = set(self.actor.trainable_weights)
+        perturbation_ops = []
+        for (perturbed_weight, weight) in zip(self.perturbed_actor.weights,
+                                              self.actor.weights):
+            if weight in trainable_weights:
+                perturbation_ops.append(
+                    tf.assign(perturbed_weight, weight + tf.random_normal(
+                        tf.shape(weight), stddev=self.param_noise_stddev)))
+            else:
+                # Non-trainable weights (e.g. normalization statistics) are copied as is
+                perturbation_ops.append(tf.assign(perturbed_weight, weight))
+        self.perturb_actor_op = tf.group(*perturbation_ops)
+
+        # RMS distance between the actions of the actor and of the perturbed actor
+        self.param_noise_distance = tf.sqrt(
+            tf.reduce_mean(
+                tf.square(
+                    self.actor(self.variables["state"]) - self.perturbed_actor(
+                        self.variables["state"]))))
+
     def compile_critic(self):
         # Compile the critic for the same reason
         self.critic.compile(optimizer='sgd', loss='mse')
@@ -313,7 +384,7 @@ class DDPGAgent(RLAgent):
         critic_filepath = filename + '_critic' + extension
         self.actor.load_weights(actor_filepath)
         self.critic.load_weights(critic_filepath)
-        self.hard_update_target_models()
+        self.hard_update_targets()
 
     def save_weights(self, filepath, overwrite=False):
         print("Saving weights")
@@ -323,6 +394,16 @@ class DDPGAgent(RLAgent):
         self.actor.save_weights(actor_filepath, overwrite=overwrite)
         self.critic.save_weights(critic_filepath, overwrite=overwrite)
 
+    def get_weights(self):
+        """Get a copy of the weights of the actor and the critic, as `{"actor": [...], "critic": [...]}`"""
+        return ({"actor": self.actor.get_weights(), "critic": self.critic.get_weights()})
+
+    def set_weights(self, weights):
+        """Set the weights of the actor and the critic (and of their targets), as returned by :meth:`get_weights`"""
+        self.actor.set_weights(weights["actor"])
+        self.critic.set_weights(weights["critic"])
+        self.hard_update_targets()
+
     def save(self, name="DDPG"):
         """Save the model as an HDF5 file"""
         self.actor.save(name + "_actor.h5")
@@ -336,6 +417,10 @@ class DDPGAgent(RLAgent):
         print("Hard update of the target actor")
         self.target_actor.set_weights(self.actor.get_weights())
 
+    def hard_update_targets(self):
+        self.hard_update_target_actor()
+        self.hard_update_target_critic()
+
     def reset_states(self):
         if self.random_process is not None:
             self.random_process.reset_states()
@@ -345,18 +430,72 @@ class DDPGAgent(RLAgent):
             self.critic.reset_states()
             self.target_actor.reset_states()
             self.target_critic.reset_states()
+            if self.param_noise is not None and getattr(self, "exploration", False):
+                self.perturb_actor()
+
+    def perturb_actor(self):
+        """Adapt the scale of the parameter noise, and resample the weights of the perturbed actor"""
+        if len(self.memory) > self.batch_size:
+            # Measure the effect of the current perturbation on the actions
+            batch = self.memory.sample(self.batch_size)
+            distance = self.session.run(
+                self.param_noise_distance,
+                feed_dict={
+                    self.variables["state"]: batch.state0,
+                    K.learning_phase(): 0
+                })
+            self.param_noise.adapt(distance)
+            self.metrics["actor/param_noise_distance"] = distance
+
+        self.session.run(
+            self.perturb_actor_op,
+            feed_dict={
+                self.param_noise_stddev: self.param_noise.current_stddev
+            })
+
+    def acting_actor(self):
+        """Name of the actor acting in the current run: the perturbed actor when exploring with parameter noise, the averaged actor when testing"""
+        if self.exploration and self.param_noise is not None:
+            return ("perturbed_actor")
+        return (self.inference_actor(deterministic=not self.training))
+
+    def inference_actor(self, deterministic=True):
+        """Name of the actor used for inference: the averaged actor if there is one and `deterministic`, otherwise the actor"""
+        if deterministic and self.polyak_actor is not None:
+            return ("averaged_actor")
+        return ("actor")
+
+    def predict_actions(self, state_batch, actor=None):
+        """
+        Compute the actions of a batch of states, without exploration noise
+
+        :param str actor: Name of the actor ("actor", "averaged_actor" or "perturbed_actor").
+            Defaults to the inference actor (see :meth:`inference_actor`), whatever the state of the last run.
+        """
+        if actor is None:
+            actor = self.inference_actor()
+        feed_dict = {self.variables["state"]: state_batch}
+        if self.uses_learning_phase:
+            feed_dict[K.learning_phase()] = 0
+        return (self.session.run(self.variables[actor + "/output"], feed_dict=feed_dict))
+
+    def select_actions(self, state_batch, actor=None):
+        """
+        Select the actions of a batch of states (e.g. of parallel environments, or for an :class:`rl.utils.serving.InferenceServer`) in a single run.
+        The noise of the random process is not applied, and the actions do not depend on the state of the last run.
+
+        :param state_batch: Array of shape `(batch_size, state_dim)`
+        :param str actor: Name of the actor (see :meth:`predict_actions`)
+        :return: The clipped actions, of shape `(batch_size, nb_actions)`
+        """
+        return (np.clip(self.predict_actions(state_batch, actor=actor), self.actions_low, self.actions_high))
 
     def select_action(self, state):
         # [state] is the unprocessed version of a batch
         batch_state = [state]
         # We get a batch of 1 action
         # action = self.actor.predict_on_batch(batch_state)[0]
-        action = self.session.run(
-            self.actor(self.variables["state"]),
-            feed_dict={
-                self.variables["state"]: batch_state,
-                K.learning_phase(): 0
-            })[0]
+        action = self.predict_actions(batch_state, actor=self.acting_actor())[0]
         assert action.shape == (self.nb_actions, )
 
         # Apply noise, if a random process is set.
@@ -387,7 +526,9 @@ class DDPGAgent(RLAgent):
         if self.training_step % self.memory_interval == 0:
             self.memory.append(
                 Experience(self.observation, self.action, self.reward,
-                           self.observation_1, self.done))
+                           self.observation_1, self.done,
+                           episode_start=(self.episode != self.memory_episode)))
+            self.memory_episode = self.episode
 
         # Train the networks
         if self.training_step % self.train_interval == 0:
@@ -461,25 +602,95 @@ class DDPGAgent(RLAgent):
                     hard_update_target_critic=hard_update_target_critic,
                     hard_update_target_actor=hard_update_target_actor)
 
+    def train_offline_epochs(self,
+                             nb_epochs=1,
+                             batch_size=None,
+                             target_update_epochs=None,
+                             verbose=True,
+                             **kwargs):
+        """
+        Train the networks in offline mode, by passes over the whole memory
+
+        Each epoch iterates over a new random permutation of the memory (see :meth:`rl.memory.Memory.iterate_epoch`),
+        each batch being one training step.
+        The hooks are called once per epoch, each epoch being an episode.
+
+        :param int nb_epochs: Number of passes over the memory
+        :param int batch_size: Size of the batches. Defaults to the batch size of the agent.
+        :param int target_update_epochs: If given, the target networks are not updated at each step,
+            but hard updated every `target_update_epochs` epochs
+        :return: The throughput, in samples per second
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+        if not self.components_seeded:
+            self.seed_components()
+        self.training = True
+        self.run_number += 1
+        self.hooks.run_init()
+
+        nb_samples = 0
+        throughput = 0.
+        start = timeit.default_timer()
+        for epoch in range(1, nb_epochs + 1):
+            self.episode += 1
+            self.training_episode += 1
+            self.episode_step = 0
+            self.done = False
+
+            for batch in self.memory.iterate_epoch(batch_size):
+                self.step += 1
+                self.training_step += 1
+                self.episode_step += 1
+                self.step_summaries = []
+                self.fit_controllers(batch=batch, update_targets=(target_update_epochs is None), **kwargs)
+                nb_samples += len(batch.state0)
+
+            if target_update_epochs is not None and epoch % target_update_epochs == 0:
+                self.hard_update_targets()
+
+            throughput = nb_samples / (timeit.default_timer() - start)
+            if verbose:
+                print_status(
+                    "Training epoch: {}/{}, {:.0f} samples/s".format(epoch, nb_epochs, throughput),
+                    terminal=(epoch == nb_epochs))
+
+            # Hooks
+            self.done = True
+            self.hooks()
+            self.hooks.episode_end()
+
+        self.hooks.run_end()
+        return (throughput)
+
     def fit_controllers(self,
                         fit_critic=True,
                         fit_actor=True,
                         can_reset_actor=False,
                         hard_update_target_critic=False,
-                        hard_update_target_actor=False):
+                        hard_update_target_actor=False,
+                        batch=None,
+                        update_targets=True):
         """
         Fit the actor and critic networks
 
         :param bool fit_critic: Whether to fit the critic
         :param bool fit_actor: Whether to fit the actor
         :param bool can_reset_actor:
+        :param batch: The batch to fit on. If None, a batch is sampled from the memory.
+        :param bool update_targets: Whether to update the target networks
 
         """
 
         if not (fit_actor or fit_critic):
             return
         else:
-            batch = self.memory.sample(self.batch_size)
+            if batch is not None:
+                pass
+            elif self.n_step > 1:
+                batch = self.memory.sample_nstep(self.batch_size, self.n_step, self.gamma)
+            else:
+                batch = self.memory.sample(self.batch_size)
 
             summaries = []
 
@@ -494,16 +705,14 @@ class DDPGAgent(RLAgent):
                 summaries += summaries_actor
 
             # Update target networks
-            if self.target_actor_update >= 1:
-                if hard_update_target_actor:
+            self.nb_fits += 1
+            if update_targets:
+                if self.target_actor_update >= 1 and hard_update_target_actor:
                     self.hard_update_target_actor()
-            else:
-                self.session.run(self.target_actor_train_op)
-            if self.target_critic_update >= 1:
-                if hard_update_target_critic:
+                if self.target_critic_update >= 1 and hard_update_target_critic:
                     self.hard_update_target_critic()
-            else:
-                self.session.run(self.target_critic_train_op)
+                if len(self.soft_update_ops) > 0 and self.nb_fits % self.target_update_interval == 0:
+                    self.session.run(self.soft_update_ops)
 
             self.step_summaries += summaries
 
@@ -520,7 +729,7 @@ class DDPGAgent(RLAgent):
                     self.variables["state"]: batch.state1,
                     K.learning_phase(): 0
                 })
-        assert target_actions.shape == (self.batch_size, self.nb_actions)
+        assert target_actions.shape == (len(batch.state1), self.nb_actions)
 
         # Get the target Q value of the next state
         # Q(s_{t + 1}, \pi(s_{t + 1}))
@@ -541,7 +750,11 @@ class DDPGAgent(RLAgent):
 
         # Full the critic targets:
         # r_t + gamma * Q(s_{t + 1}, \pi(s_{t + 1}))
-        discounted_reward_batch = self.gamma * target_q_values
+        # or, for n-step batches, the n-step return, bootstrapped with the discount of the batch
+        if hasattr(batch, "discount"):
+            discounted_reward_batch = batch.discount * target_q_values
+        else:
+            discounted_reward_batch = self.gamma * target_q_values
         critic_targets = (batch.reward + discounted_reward_batch)
 
         feed_dict = {
@@ -550,16 +763,8 @@ class DDPGAgent(RLAgent):
             self.critic_target: critic_targets
         }
 
-        # Collect summaries and metrics before training the critic
-        summaries = self.session.run(
-            self.critic_summaries, feed_dict=feed_dict)
-
         # Train the critic
-        for _ in range(sgd_iterations):
-            # FIXME: The intermediate gradient values are not captured
-            self.session.run(self.critic_train_op, feed_dict=feed_dict)
-
-        return (summaries)
+        return (self.train_with_metrics(self.critic_train_op, "critic", feed_dict, sgd_iterations))
 
     def fit_actor(self, batch, sgd_iterations=1, can_reset_actor=False):
         """Fit the actor network"""
@@ -569,17 +774,12 @@ class DDPGAgent(RLAgent):
             K.learning_phase(): 1
         }
 
-        # Collect metrics before training the actor
-        self.metrics["actor/gradient_norm"], summaries = self.session.run(
-            [self.variables["actor/gradient_norm"], self.actor_summaries],
-            feed_dict=feed_dict)
-
         # Train the actor
-        for _ in range(sgd_iterations):
-            # FIXME: The intermediate gradient values are not captured
-            self.session.run(self.actor_train_op, feed_dict=feed_dict)
+        summaries = self.train_with_metrics(self.actor_train_op, "actor", feed_dict, sgd_iterations)
 
         if can_reset_actor:
+            if "actor/gradient_norm" not in self.step_metrics:
+                self.metrics.update(self.metrics_registry.evaluate(self.session, feed_dict, names=["actor/gradient_norm"]))
             # Reset the actor if the gradient is flat
             if self.metrics["actor/gradient_norm"] <= self.actor_reset_threshold:
                 # TODO: Use a gradient on a rolling window: multiple steps (and even multiple episodes)
@@ -587,22 +787,102 @@ class DDPGAgent(RLAgent):
 
         return (summaries)
 
-    def checkpoint(self):
-        """Save the weights"""
-        self.checkpoints.append((self.actor.get_weights(),
-                                 self.critic.get_weights()))
+    def register_metrics(self):
+        """Register the metrics of the networks in the metrics registry"""
+        for (name, tensor) in self.variables.items():
+            parts = name.split("/")
+            # Skip the placeholders, the action outputs, and the actor's loss (we already have actor/objective)
+            if len(parts) < 2 or name == "actor/loss" or parts[-1] == "output":
+                continue
+            group = "critic" if parts[0] in ("critic", "target_critic") else "actor"
+            if len(parts) > 2:
+                # Metric of a single weight
+                self.metrics_registry.register(name, tensor, cost=PER_LAYER, group=group,
+                                               with_train_op=(parts[-1] == "gradient_norm"))
+            elif parts[-1] == "norm":
+                # The weights evolve slowly
+                self.metrics_registry.register(name, tensor, cost=SCALAR, group=group, interval=100,
+                                               with_train_op=False)
+            else:
+                # Losses and gradients, computed anyway by the train op
+                self.metrics_registry.register(name, tensor, cost=SCALAR, group=group)
+
+    def train_with_metrics(self, train_op, group, feed_dict, sgd_iterations=1):
+        """
+        Run a train op, and compute the metrics of its group due at this step
+
+        The metrics fetched with the train op are computed in the same run as the first iteration,
+        the others in a separate run before training.
+        The values are stored in :attr:`metrics`.
+
+        :return: A list of summaries
+        """
+        values = {}
+        metrics = self.metrics_registry.due(group, self.nb_fits, with_train_op=False)
+        if len(metrics) > 0:
+            fetched = self.session.run([metric.tensor for metric in metrics], feed_dict=feed_dict)
+            values.update(zip([metric.name for metric in metrics], fetched))
+
+        metrics = self.metrics_registry.due(group, self.nb_fits, with_train_op=True)
+        for iteration in range(sgd_iterations):
+            # FIXME: The intermediate gradient values are not captured
+            if iteration == 0 and len(metrics) > 0:
+                _, fetched = self.session.run([train_op, [metric.tensor for metric in metrics]], feed_dict=feed_dict)
+                values.update(zip([metric.name for metric in metrics], fetched))
+            else:
+                self.session.run(train_op, feed_dict=feed_dict)
+
+        self.step_metrics = values
+        self.metrics.update(values)
+        if len(values) == 0:
+            return ([])
+        return ([to_summary(values)])
+
+    def compile_restore_ops(self):
+        """Create the ops assigning fed weights to a network and its target"""
+        self.restore_placeholders = {}
+        self.restore_ops = {}
+        for name, network, target in [("actor", self.actor, self.target_actor), ("critic", self.critic, self.target_critic)]:
+            placeholders = [tf.placeholder(weight.dtype.base_dtype, shape=weight.get_shape()) for weight in network.weights]
+            assignments = []
+            for placeholder, weight, target_weight in zip(placeholders, network.weights, target.weights):
+                assignments += [tf.assign(weight, placeholder), tf.assign(target_weight, placeholder)]
+            self.restore_placeholders[name] = placeholders
+            self.restore_ops[name] = tf.group(*assignments)
+
+    def checkpoint(self, name=None, tags=()):
+        """
+        Save the weights in the checkpoint store
+
+        :param str name: Name of the checkpoint, replacing any checkpoint of the same name.
+            Defaults to a new name, `"checkpoint-<number of checkpoints>"`.
+        :param tags: Tags of the checkpoint, e.g. "best"
+        """
+        if name is None:
+            name = "checkpoint-{}".format(self.checkpoints.nb_created)
+        self.checkpoints.put(name, self.get_weights(), tags=tags)
 
-    def restore_checkpoint(self, actor=True, critic=True, checkpoint_id=0):
-        """Restore from checkpoint"""
-        weights_actor, weights_critic = self.checkpoints[checkpoint_id]
+    def restore_checkpoint(self, actor=True, critic=True, checkpoint_id=0, name=None):
+        """
+        Restore the networks, and their targets, from a checkpoint
+
+        :param int checkpoint_id: Index of the checkpoint, in the order they were saved: 0 for the initial weights, -1 for the last checkpoint
+        :param str name: Name of the checkpoint. If given, `checkpoint_id` is ignored.
+        """
+        if name is None:
+            name = self.checkpoints.history[checkpoint_id]
+        weights = self.checkpoints.get(name)
+        ops = []
+        feed_dict = {}
         if actor:
             print_warning("Restoring actor and target actor")
-            self.actor.set_weights(weights_actor)
-            self.target_actor.set_weights(weights_actor)
+            ops.append(self.restore_ops["actor"])
+            feed_dict.update(zip(self.restore_placeholders["actor"], weights["actor"]))
         if critic:
             print_warning("Restoring critic")
-            self.critic.set_weights(weights_critic)
-            self.target_critic.set_weights(weights_critic)
+            ops.append(self.restore_ops["critic"])
+            feed_dict.update(zip(self.restore_placeholders["critic"], weights["critic"]))
+        self.session.run(ops, feed_dict=feed_dict)
 
 
 def process_parameterization_variable(param):
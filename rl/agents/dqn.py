@@ -1,25 +1,42 @@
 from __future__ import division
 import warnings
 
+import numpy as np
 import keras.backend as K
+import keras.metrics
 from keras.layers import Lambda, Input, Layer, Dense
 
-from rl.agent import Agent
+from rl.agents.rlagent import RLAgent
 from rl.policy import EpsGreedyQPolicy, GreedyQPolicy
-from rl.util import *
-from rl.keras_future import Model
+from rl.utils.model import clone_model, get_soft_target_model_updates, get_object_config, AdditionalUpdatesOptimizer
+from rl.utils.numerics import huber_loss
+from rl.legacy.keras_future import Model, concatenate
 
 
 def mean_q(y_true, y_pred):
     return K.mean(K.max(y_pred, axis=-1))
 
 
-class AbstractDQNAgent(Agent):
+def target_metric(metric, nb_actions):
+    """
+    Wrap a Keras metric `f(y_true, y_pred)` of the Q values, to compute it against targets computed in the graph
+
+    The wrapped metric is given an output concatenating the targets and the Q values, and ignores the fed (dummy) targets.
+    """
+    metric_fn = keras.metrics.get(metric)
+
+    def wrapped_metric(y_true, y_pred):
+        return metric_fn(y_pred[:, :nb_actions], y_pred[:, nb_actions:])
+    wrapped_metric.__name__ = metric if isinstance(metric, str) else metric_fn.__name__
+    return wrapped_metric
+
+
+class AbstractDQNAgent(RLAgent):
     """Write me
     """
     def __init__(self, nb_actions, memory, gamma=.99, batch_size=32, nb_steps_warmup=1000,
                  train_interval=1, memory_interval=1, target_model_update=10000,
-                 delta_range=None, delta_clip=np.inf, custom_model_objects={}, **kwargs):
+                 delta_range=None, delta_clip=np.inf, custom_model_objects={}, n_step=1, processor=None, **kwargs):
         super(AbstractDQNAgent, self).__init__(**kwargs)
 
         # Soft vs hard target model updates.
@@ -46,13 +63,30 @@ class AbstractDQNAgent(Agent):
         self.target_model_update = target_model_update
         self.delta_clip = delta_clip
         self.custom_model_objects = custom_model_objects
+        # Number of steps of the returns, before bootstrapping on the target network
+        self.n_step = n_step
 
         # Related objects.
         self.memory = memory
+        self.processor = processor
 
         # State.
         self.compiled = False
 
+    def sample_batch(self):
+        """
+        Sample a batch of (n-step) transitions
+
+        :return: The batch, and the discount factor of the bootstrapped values, of shape `(batch_size,)` (0 for terminal states)
+        """
+        if self.n_step > 1:
+            batch = self.memory.sample_nstep(self.batch_size, self.n_step, self.gamma)
+            discount_batch = np.asarray(batch.discount, dtype='float32')
+        else:
+            batch = self.memory.sample(self.batch_size)
+            discount_batch = self.gamma * (1. - np.asarray(batch.terminal1, dtype='float32'))
+        return batch, discount_batch.reshape(self.batch_size)
+
     def process_state_batch(self, batch):
         batch = np.array(batch)
         if self.processor is None:
@@ -80,6 +114,7 @@ class AbstractDQNAgent(Agent):
             'memory_interval': self.memory_interval,
             'target_model_update': self.target_model_update,
             'delta_clip': self.delta_clip,
+            'n_step': self.n_step,
             'memory': get_object_config(self.memory),
         }
 
@@ -154,7 +189,13 @@ class DQNAgent(AbstractDQNAgent):
         return config
 
     def compile(self, optimizer, metrics=[]):
-        metrics += [mean_q]  # register default metrics
+        """
+        Compile the agent
+
+        :param metrics: Keras metrics of the Q values. They are computed against the targets of the batch,
+            which are the discounted returns for the actions taken, and the Q values themselves for the other actions.
+        """
+        metrics = metrics + [mean_q]  # register default metrics
 
         # We never train the target model, hence we can set the optimizer and loss arbitrarily.
         self.target_model = clone_model(self.model, self.custom_model_objects)
@@ -167,24 +208,57 @@ class DQNAgent(AbstractDQNAgent):
             updates = get_soft_target_model_updates(self.target_model, self.model, self.target_model_update)
             optimizer = AdditionalUpdatesOptimizer(optimizer, updates)
 
-        def clipped_masked_error(args):
-            y_true, y_pred, mask = args
-            loss = huber_loss(y_true, y_pred, self.delta_clip)
-            loss *= mask  # apply element-wise mask
+        def compute_targets(args):
+            y_pred, q_values, target_q_values, reward, discount, action = args
+            if self.enable_double_dqn:
+                # According to the paper "Deep Reinforcement Learning with Double Q-learning"
+                # (van Hasselt et al., 2015), in Double DQN, the online network predicts the actions
+                # while the target network is used to estimate the Q value.
+                actions = K.one_hot(K.argmax(q_values, axis=-1), self.nb_actions)
+                q_batch = K.sum(target_q_values * actions, axis=-1, keepdims=True)
+            else:
+                # Extract the maximum of the target Q values for each sample in the batch.
+                # We perform this prediction on the target_model instead of the model for reasons
+                # outlined in Mnih (2015). In short: it makes the algorithm more stable.
+                q_batch = K.max(target_q_values, axis=-1, keepdims=True)
+
+            # Compute r_t + gamma * max_a Q(s_t+1, a), the discount being zero for terminal states
+            # (or the n-step equivalent, with gamma ** n).
+            # Only update the output units of the actions taken: the targets of the other ones are their current values.
+            # The targets are constants: the gradient only flows through y_pred
+            mask = K.one_hot(K.cast(action[:, 0], 'int32'), self.nb_actions)
+            return K.stop_gradient(mask * (reward + discount * q_batch) + (1. - mask) * y_pred)
+
+        def clipped_error(args):
+            y_pred, targets = args
+            # The error, hence the loss and its gradient, are zero for the actions not taken
+            loss = huber_loss(targets, y_pred, self.delta_clip)
             return K.sum(loss, axis=-1)
 
         # Create trainable model. The problem is that we need to mask the output since we only
         # ever want to update the Q values for a certain action. The way we achieve this is by
         # using a custom Lambda layer that computes the loss. This gives us the necessary flexibility
         # to mask out certain parameters by passing in multiple inputs to the Lambda layer.
+        # The targets are also computed in the graph, so that a whole update is a single graph evaluation.
         y_pred = self.model.output
-        y_true = Input(name='y_true', shape=(self.nb_actions,))
-        mask = Input(name='mask', shape=(self.nb_actions,))
-        loss_out = Lambda(clipped_masked_error, output_shape=(1,), name='loss')([y_pred, y_true, mask])
         ins = [self.model.input] if type(self.model.input) is not list else self.model.input
-        trainable_model = Model(input=ins + [y_true, mask], output=[loss_out, y_pred])
+        ins1 = [Input(name='state1_{}'.format(idx), shape=K.int_shape(x)[1:]) for idx, x in enumerate(ins)]
+        state1 = ins1[0] if type(self.model.input) is not list else ins1
+        # The target model is only used in feed-forward mode
+        self.target_model.trainable = False
+        target_q_values = self.target_model(state1)
+        q_values = self.model(state1) if self.enable_double_dqn else target_q_values
+        reward = Input(name='reward', shape=(1,))
+        discount = Input(name='discount', shape=(1,))
+        action = Input(name='action', shape=(1,))
+        targets = Lambda(compute_targets, output_shape=(self.nb_actions,), name='targets')(
+            [y_pred, q_values, target_q_values, reward, discount, action])
+        loss_out = Lambda(clipped_error, output_shape=(1,), name='loss')([y_pred, targets])
+        # The metrics are computed on the targets and the Q values, concatenated in the second output
+        metrics_out = concatenate([targets, y_pred])
+        trainable_model = Model(input=ins + ins1 + [reward, discount, action], output=[loss_out, metrics_out])
         assert len(trainable_model.output_names) == 2
-        combined_metrics = {trainable_model.output_names[1]: metrics}
+        combined_metrics = {trainable_model.output_names[1]: [target_metric(metric, self.nb_actions) for metric in metrics]}
         losses = [
             lambda y_true, y_pred: y_pred,  # loss is computed in Lambda layer
             lambda y_true, y_pred: K.zeros_like(y_pred),  # we only include this for the metrics
@@ -228,6 +302,19 @@ class DQNAgent(AbstractDQNAgent):
 
         return action
 
+    def select_actions(self, state_batch, **kwargs):
+        """
+        Select the actions of a batch of states (e.g. of parallel environments), with a single prediction and a single policy call
+
+        :param kwargs: Other parameters of the `select_actions` method of the policy, e.g. the `steps` of a :class:`rl.policy.LinearAnnealedPolicy`
+        :return: The actions, of shape `(batch_size,)`, not processed by the processor
+        """
+        q_values = self.compute_batch_q_values(state_batch)
+        if self.training:
+            return self.policy.select_actions(q_values=q_values, **kwargs)
+        else:
+            return self.test_policy.select_actions(q_values=q_values, **kwargs)
+
     def backward(self, reward, terminal):
         # Store most recent experience in memory.
         if self.step % self.memory_interval == 0:
@@ -242,78 +329,21 @@ class DQNAgent(AbstractDQNAgent):
 
         # Train the network on a single stochastic batch.
         if self.step > self.nb_steps_warmup and self.step % self.train_interval == 0:
-            experiences = self.memory.sample(self.batch_size)
-            assert len(experiences) == self.batch_size
-
-            # Start by extracting the necessary parameters (we use a vectorized implementation).
-            state0_batch = []
-            reward_batch = []
-            action_batch = []
-            terminal1_batch = []
-            state1_batch = []
-            for e in experiences:
-                state0_batch.append(e.state0)
-                state1_batch.append(e.state1)
-                reward_batch.append(e.reward)
-                action_batch.append(e.action)
-                terminal1_batch.append(0. if e.terminal1 else 1.)
+            batch, discount_batch = self.sample_batch()
 
             # Prepare and validate parameters.
-            state0_batch = self.process_state_batch(state0_batch)
-            state1_batch = self.process_state_batch(state1_batch)
-            terminal1_batch = np.array(terminal1_batch)
-            reward_batch = np.array(reward_batch)
-            assert reward_batch.shape == (self.batch_size,)
-            assert terminal1_batch.shape == reward_batch.shape
-            assert len(action_batch) == len(reward_batch)
-
-            # Compute Q values for mini-batch update.
-            if self.enable_double_dqn:
-                # According to the paper "Deep Reinforcement Learning with Double Q-learning"
-                # (van Hasselt et al., 2015), in Double DQN, the online network predicts the actions
-                # while the target network is used to estimate the Q value.
-                q_values = self.model.predict_on_batch(state1_batch)
-                assert q_values.shape == (self.batch_size, self.nb_actions)
-                actions = np.argmax(q_values, axis=1)
-                assert actions.shape == (self.batch_size,)
-
-                # Now, estimate Q values using the target network but select the values with the
-                # highest Q value wrt to the online model (as computed above).
-                target_q_values = self.target_model.predict_on_batch(state1_batch)
-                assert target_q_values.shape == (self.batch_size, self.nb_actions)
-                q_batch = target_q_values[range(self.batch_size), actions]
-            else:
-                # Compute the q_values given state1, and extract the maximum for each sample in the batch.
-                # We perform this prediction on the target_model instead of the model for reasons
-                # outlined in Mnih (2015). In short: it makes the algorithm more stable.
-                target_q_values = self.target_model.predict_on_batch(state1_batch)
-                assert target_q_values.shape == (self.batch_size, self.nb_actions)
-                q_batch = np.max(target_q_values, axis=1).flatten()
-            assert q_batch.shape == (self.batch_size,)
-
-            targets = np.zeros((self.batch_size, self.nb_actions))
-            dummy_targets = np.zeros((self.batch_size,))
-            masks = np.zeros((self.batch_size, self.nb_actions))
-
-            # Compute r_t + gamma * max_a Q(s_t+1, a) and update the target targets accordingly,
-            # but only for the affected output units (as given by action_batch).
-            discounted_reward_batch = self.gamma * q_batch
-            # Set discounted reward to zero for all states that were terminal.
-            discounted_reward_batch *= terminal1_batch
-            assert discounted_reward_batch.shape == reward_batch.shape
-            Rs = reward_batch + discounted_reward_batch
-            for idx, (target, mask, R, action) in enumerate(zip(targets, masks, Rs, action_batch)):
-                target[action] = R  # update action with estimated accumulated reward
-                dummy_targets[idx] = R
-                mask[action] = 1.  # enable loss for this specific action
-            targets = np.array(targets).astype('float32')
-            masks = np.array(masks).astype('float32')
-
-            # Finally, perform a single update on the entire batch. We use a dummy target since
-            # the actual loss is computed in a Lambda layer that needs more complex input. However,
-            # it is still useful to know the actual target to compute metrics properly.
+            state0_batch = self.process_state_batch(batch.state0)
+            state1_batch = self.process_state_batch(batch.state1)
+            discount_batch = discount_batch.reshape((self.batch_size, 1))
+            reward_batch = batch.reward.reshape((self.batch_size, 1))
+            action_batch = batch.action.reshape((self.batch_size, 1))
+
+            # Finally, perform a single update on the entire batch: the targets, the masks and the loss are
+            # all computed in the graph, in a Lambda layer. We hence use dummy targets for the outputs.
             ins = [state0_batch] if type(self.model.input) is not list else state0_batch
-            metrics = self.trainable_model.train_on_batch(ins + [targets, masks], [dummy_targets, targets])
+            ins1 = [state1_batch] if type(self.model.input) is not list else state1_batch
+            dummy_targets = [np.zeros((self.batch_size,)), np.zeros((self.batch_size, 2 * self.nb_actions))]
+            metrics = self.trainable_model.train_on_batch(ins + ins1 + [reward_batch, discount_batch, action_batch], dummy_targets)
             metrics = [metric for idx, metric in enumerate(metrics) if idx not in (1, 2)]  # throw away individual losses
             metrics += self.policy.metrics
             if self.processor is not None:
@@ -660,40 +690,23 @@ class NAFAgent(AbstractDQNAgent):
 
         # Train the network on a single stochastic batch.
         if self.step > self.nb_steps_warmup and self.step % self.train_interval == 0:
-            experiences = self.memory.sample(self.batch_size)
-            assert len(experiences) == self.batch_size
-
-            # Start by extracting the necessary parameters (we use a vectorized implementation).
-            state0_batch = []
-            reward_batch = []
-            action_batch = []
-            terminal1_batch = []
-            state1_batch = []
-            for e in experiences:
-                state0_batch.append(e.state0)
-                state1_batch.append(e.state1)
-                reward_batch.append(e.reward)
-                action_batch.append(e.action)
-                terminal1_batch.append(0. if e.terminal1 else 1.)
+            batch, discount_batch = self.sample_batch()
 
             # Prepare and validate parameters.
-            state0_batch = self.process_state_batch(state0_batch)
-            state1_batch = self.process_state_batch(state1_batch)
-            terminal1_batch = np.array(terminal1_batch)
-            reward_batch = np.array(reward_batch)
-            action_batch = np.array(action_batch)
+            state0_batch = self.process_state_batch(batch.state0)
+            state1_batch = self.process_state_batch(batch.state1)
+            reward_batch = batch.reward.reshape(self.batch_size)
+            action_batch = batch.action
             assert reward_batch.shape == (self.batch_size,)
-            assert terminal1_batch.shape == reward_batch.shape
+            assert discount_batch.shape == reward_batch.shape
             assert action_batch.shape == (self.batch_size, self.nb_actions)
 
             # Compute Q values for mini-batch update.
             q_batch = self.target_V_model.predict_on_batch(state1_batch).flatten()
             assert q_batch.shape == (self.batch_size,)
 
-            # Compute discounted reward.
-            discounted_reward_batch = self.gamma * q_batch
-            # Set discounted reward to zero for all states that were terminal.
-            discounted_reward_batch *= terminal1_batch
+            # Compute discounted reward, set to zero for all states that were terminal.
+            discounted_reward_batch = discount_batch * q_batch
             assert discounted_reward_batch.shape == reward_batch.shape
             Rs = reward_batch + discounted_reward_batch
             assert Rs.shape == (self.batch_size,)
@@ -1,9 +1,16 @@
 import numpy as np
 from rl.runtime.agent import Agent
-from rl.utils.printer import print_epoch, print_info
+from rl.utils.printer import print_epoch, print_info, print_status
+from rl.utils.workers import ReplicaPool
 from rl.runtime.experiment import DefaultExperiment
 
 
+def compute_effect(environment, args):
+    """Run a policy in an environment replica, and return its achievement and reward"""
+    policy, kwargs = args
+    return (environment.compute_sensori_effect(policy, **kwargs))
+
+
 class GEPAgent(Agent):
     def __init__(self, environment, model, im_model, experiment=None, **kwargs):
         self.environment = environment
@@ -19,6 +26,11 @@ class GEPAgent(Agent):
         # Finish with agent initialization since Hook initialization can depend on custom GEPAgent variables
         super(GEPAgent, self).__init__(experiment=self.experiment, **kwargs)
 
+        # Seed the random components (e.g. the exploration noise of the model) with child seeds of the agent
+        for component in (self.model, self.im_model):
+            if hasattr(component, "seed"):
+                component.seed(self.spawn_seed())
+
     def _run(self,
              n_episodes,
              train=True,
@@ -137,23 +149,111 @@ class GEPAgent(Agent):
     def test_goal(self, goal):
         pass
 
+    def test_goals(self,
+                   goals,
+                   noisy_policy_parameters=False,
+                   env_fn=None,
+                   nb_processes=None,
+                   start_method=None,
+                   noisy_action=False,
+                   noise_intensity=0.3):
+        """
+        Test a batch of goals at once
+
+        All the goals are inverted in a single call to `inverse_prediction`, so the model must accept a batch of goals
+        (e.g. :class:`rl.utils.neighbors.NearestNeighborModel`).
+        The rollouts are run in a pool of environment replicas if `env_fn` is given, otherwise sequentially in the agent's environment.
+        The hooks are notified once, with `batch_init` and `batch_end` (see :class:`rl.hooks.hook.Hook`), not as a run.
+
+        :param goals: Array of goals, of shape `(nb_goals, goal_dim)`
+        :param env_fn: Function without arguments returning an environment replica, picklable (see :class:`rl.utils.workers.ReplicaPool`)
+        :param int nb_processes: Number of processes of the pool. Defaults to the number of cores.
+        :return: The errors of the goals, as an array of shape `(nb_goals,)`
+        """
+        goals = np.asarray(goals)
+        print_info("Beginning a test of {} goals".format(len(goals)))
+        self.training = False
+        if noisy_policy_parameters:
+            self.model.mode = "explore"
+        else:
+            self.model.mode = "exploit"
+        self.hooks.batch_init()
+
+        self.goals = goals
+        self.policies = self.model.inverse_prediction(goals)
+        kwargs = {"noisy_action": noisy_action, "noise_intensity": noise_intensity}
+        items = [(policy, kwargs) for policy in self.policies]
+        if env_fn is None:
+            results = [compute_effect(self.environment, item) for item in items]
+        else:
+            with ReplicaPool(env_fn, nb_processes=nb_processes, start_method=start_method) as pool:
+                results = pool.map(compute_effect, items)
+        self.achievements = np.array([achievement for achievement, _ in results])
+        self.episode_rewards = np.array([reward for _, reward in results])
+        self.errors = np.linalg.norm(goals - self.achievements, axis=1)
+
+        self.step += len(goals) * self.environment.rollout_size
+        self.episode += len(goals)
+        self.done = True
+        self.hooks.batch_end()
+        return (self.errors)
+
     def bootstrap(self,
                   n_bootstrap,
                   save_to_replay_buffer=False,
                   noisy_action=False,
-                  render=False):
+                  render=False,
+                  env_fn=None,
+                  nb_processes=None,
+                  start_method=None):
+        """
+        Motor babbling: run random motor commands, and store them with their outcomes in the model
+
+        :param int n_bootstrap: Number of motor commands
+        :param env_fn: Function without arguments returning an environment replica, picklable (see :class:`rl.utils.workers.ReplicaPool`).
+            If given, the commands are run in parallel in a pool of replicas, and stored in the model at once.
+            The hooks are then not called during the rollouts, but notified once with `batch_init` and `batch_end`,
+            the commands, outcomes and rewards being set in `agent.policies`, `agent.achievements` and `agent.episode_rewards`.
+        :param int nb_processes: Number of processes of the pool. Defaults to the number of cores.
+        """
         print_info("Bootstrapping: Motor babbling...")
         if n_bootstrap <= 0:
             raise (ValueError("0 bootstrap epoch selected, select at least 1"))
 
-        for epoch, m in enumerate(
-                self.environment.random_motors(n=n_bootstrap)):
-            s, _ = self.environment.compute_sensori_effect(
-                m,
-                save_to_replay_buffer=save_to_replay_buffer,
-                noisy_action=noisy_action,
-                render=render,
-                hooks=self.hooks)
-            print("Iteration {}/{}. Achievement: {}".format(
-                epoch + 1, n_bootstrap, s))
-            self.model.update(m, s)
+        if env_fn is None:
+            for epoch, m in enumerate(
+                    self.environment.random_motors(n=n_bootstrap)):
+                s, _ = self.environment.compute_sensori_effect(
+                    m,
+                    save_to_replay_buffer=save_to_replay_buffer,
+                    noisy_action=noisy_action,
+                    render=render,
+                    hooks=self.hooks)
+                print("Iteration {}/{}. Achievement: {}".format(
+                    epoch + 1, n_bootstrap, s))
+                self.model.update(m, s)
+            return
+
+        if save_to_replay_buffer or render:
+            raise (ValueError("The replay buffer and the rendering are not available with parallel bootstrapping"))
+        self.hooks.batch_init()
+        motors = np.array(self.environment.random_motors(n=n_bootstrap))
+        items = [(m, {"noisy_action": noisy_action}) for m in motors]
+        with ReplicaPool(env_fn, nb_processes=nb_processes, start_method=start_method) as pool:
+            results = pool.map(compute_effect, items)
+        outcomes = np.array([s for s, _ in results])
+        print_status("Bootstrapped {} motor commands".format(n_bootstrap), terminal=True)
+
+        # Motor babbling has no goals
+        self.goals = None
+        self.errors = None
+        self.policies = motors
+        self.achievements = outcomes
+        self.episode_rewards = np.array([reward for _, reward in results])
+        self.hooks.batch_end()
+
+        if hasattr(self.model, "update_batch"):
+            self.model.update_batch(motors, outcomes)
+        else:
+            for m, s in zip(motors, outcomes):
+                self.model.update(m, s)
@@ -1,10 +1,31 @@
 from rl.runtime.agent import Agent
 from rl.runtime.experiment import DefaultExperiment
-from rl.utils.printer import print_epoch
+from rl.utils.printer import print_epoch, print_status
+from rl.utils.workers import ReplicaPool
+from rl.memory import Batch
 import numpy as np
 import pickle
 
 
+def simulate_transitions(environment, args):
+    """
+    Set each state in an environment replica, step it with the corresponding action, and return the columns of the transitions
+
+    The environment is reset before each transition, since its wrappers (e.g. `TimeLimit`) may require it, or count the steps since the last reset.
+    """
+    states, actions = args
+    states1, rewards, terminals = [], [], []
+    for state, action in zip(states, actions):
+        environment.reset()
+        # FIXME: Expose set_state directly in the environment root
+        environment.env.set_state(state)
+        state1, reward, done, info = environment.step(action)
+        states1.append(state1)
+        rewards.append(reward)
+        terminals.append(done)
+    return (np.array(states1), np.array(rewards), np.array(terminals))
+
+
 class OmniscientAgent(Agent):
     def __init__(self, environment, experiment, **kwargs):
         self.environment = environment
@@ -32,14 +53,14 @@ class OmniscientAgent(Agent):
         for epoch in range(1, steps + 1):
             print_epoch(epoch, steps)
             # Pick a random state
-            observation_pre = np.random.uniform(observation_space_low, observation_space_high, size=self.environment.observation_space.shape)
+            observation_pre = self.random_state.uniform(observation_space_low, observation_space_high, size=self.environment.observation_space.shape)
 
             # Set it in the environment
             # FIXME: Expose set_state directly in the environment root
             self.environment.env.set_state(observation_pre)
 
             # Simulate from this state with a random action
-            random_action = np.random.uniform(action_space_low, action_space_high, size=self.environment.action_space.shape)
+            random_action = self.random_state.uniform(action_space_low, action_space_high, size=self.environment.action_space.shape)
             observation_post, reward, done, info = self.environment.step(random_action)
             self.replay_buffer.append([observation_pre, random_action, reward, observation_post, done])
 
@@ -49,3 +70,74 @@ class OmniscientAgent(Agent):
     def dump_memory(self, file):
         with open(file, "wb") as fd:
             pickle.dump(self.replay_buffer, fd)
+
+    def generate(self,
+                 nb_transitions,
+                 memory=None,
+                 file=None,
+                 chunk_size=100000,
+                 env_fn=None,
+                 nb_processes=None,
+                 start_method=None,
+                 observation_space_low=None,
+                 observation_space_high=None,
+                 action_space_low=None,
+                 action_space_high=None):
+        """
+        Generate transitions from random states and actions, by chunks
+
+        The states and actions of each chunk are drawn at once, and simulated in a pool of environment replicas if `env_fn` is given.
+        Each chunk is added to `memory` and/or appended to `file` as a :class:`rl.memory.Batch`,
+        which can be loaded with :meth:`rl.memory.SimpleMemory.from_file` (with `independent_transitions=True`).
+        Each transition begins a new episode.
+
+        :param int nb_transitions: Number of transitions
+        :param memory: A memory with an `extend` method, e.g. :class:`rl.memory.SimpleMemory`
+        :param str file: Path of the file the transitions are streamed to
+        :param int chunk_size: Number of transitions generated at once
+        :param env_fn: Function without arguments returning an environment replica, picklable (see :class:`rl.utils.workers.ReplicaPool`)
+        :param int nb_processes: Number of processes of the pool. Defaults to the number of cores.
+        """
+        if observation_space_low is None:
+            observation_space_low = self.environment.observation_space.low
+        if observation_space_high is None:
+            observation_space_high = self.environment.observation_space.high
+        if action_space_high is None:
+            action_space_high = self.environment.action_space.high
+        if action_space_low is None:
+            action_space_low = self.environment.action_space.low
+
+        pool = None
+        fd = None
+        if env_fn is not None:
+            pool = ReplicaPool(env_fn, nb_processes=nb_processes, start_method=start_method)
+        if file is not None:
+            fd = open(file, "wb")
+
+        try:
+            for first in range(0, nb_transitions, chunk_size):
+                size = min(chunk_size, nb_transitions - first)
+                states = self.random_state.uniform(observation_space_low, observation_space_high, size=(size, ) + self.environment.observation_space.shape)
+                actions = self.random_state.uniform(action_space_low, action_space_high, size=(size, ) + self.environment.action_space.shape)
+
+                if pool is None:
+                    states1, rewards, terminals = simulate_transitions(self.environment, (states, actions))
+                else:
+                    # Split the chunk in about 4 parts per process
+                    nb_parts = min(size, 4 * pool.nb_processes)
+                    parts = list(zip(np.array_split(states, nb_parts), np.array_split(actions, nb_parts)))
+                    results = pool.map(simulate_transitions, parts, chunksize=1)
+                    states1, rewards, terminals = [np.concatenate(column) for column in zip(*results)]
+
+                batch = Batch(state0=states, action=actions, reward=rewards.reshape((size, 1)), state1=states1, terminal1=terminals.reshape((size, 1)))
+                if memory is not None:
+                    memory.extend(batch, episode_start=np.ones(size, dtype=bool))
+                if fd is not None:
+                    pickle.dump(batch, fd, protocol=pickle.HIGHEST_PROTOCOL)
+                print_status("Generated {}/{} transitions".format(first + size, nb_transitions), terminal=(first + size == nb_transitions))
+        finally:
+            if pool is not None:
+                pool.close()
+            if fd is not None:
+                fd.close()
+
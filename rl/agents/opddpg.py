@@ -20,7 +20,7 @@ class OPDDPGAgent(DDPGAgent):
             self.bootstrap_actor(self.variables["state"]),
             feed_dict={self.variables["state"]: batch.state1,
                        K.learning_phase(): 0})
-        assert target_actions.shape == (self.batch_size, self.nb_actions)
+        assert target_actions.shape == (len(batch.state1), self.nb_actions)
 
         # Get the target Q value of the next state
         # Q(s_{t + 1}, \pi(s_{t + 1}))
@@ -36,7 +36,11 @@ class OPDDPGAgent(DDPGAgent):
 
         # Full the critic targets:
         # r_t + gamma * Q(s_{t + 1}, \pi(s_{t + 1}))
-        discounted_reward_batch = self.gamma * target_q_values
+        # or, for n-step batches, the n-step return, bootstrapped with the discount of the batch
+        if hasattr(batch, "discount"):
+            discounted_reward_batch = batch.discount * target_q_values
+        else:
+            discounted_reward_batch = self.gamma * target_q_values
         critic_targets = (batch.reward + discounted_reward_batch)
 
         feed_dict = {
@@ -45,13 +49,5 @@ class OPDDPGAgent(DDPGAgent):
             self.critic_target: critic_targets
         }
 
-        # Collect summaries and metrics before training the critic
-        summaries = self.session.run(
-            self.critic_summaries, feed_dict=feed_dict)
-
         # Train the critic
-        for _ in range(sgd_iterations):
-            # FIXME: The intermediate gradient values are not captured
-            self.session.run(self.critic_train_op, feed_dict=feed_dict)
-
-        return (summaries)
+        return (self.train_with_metrics(self.critic_train_op, "critic", feed_dict, sgd_iterations))
@@ -1,5 +1,6 @@
 # For python2 support
 import warnings
+import timeit
 from copy import deepcopy
 
 import numpy as np
@@ -15,9 +16,21 @@ STEPS_TERMINATION = 1
 EPISODES_TERMINATION = 2
 
 
+def copy_observation(observation):
+    """Copy an observation, taking the fast path for numpy arrays"""
+    if isinstance(observation, np.ndarray):
+        return (observation.copy())
+    else:
+        return (deepcopy(observation))
+
+
 class RLAgent(Agent):
     """Generic agent class"""
 
+    #: Attributes holding the random components of the agent (with a `seed` method).
+    #: They are given child seeds of the agent before its first run.
+    random_components = ("memory", "random_process", "policy", "test_policy")
+
     def __init__(self, **kwargs):
         super(RLAgent, self).__init__(**kwargs)
 
@@ -29,6 +42,29 @@ class RLAgent(Agent):
         self.summary_variables = {}
 
         self.checkpoints = []
+        self.components_seeded = False
+
+    def seed_components(self, env=None):
+        """
+        Seed each random component of the agent with a new child seed of the agent
+
+        :param env: If given, the environment is seeded too (see :meth:`seed_env`)
+        """
+        for name in self.random_components:
+            component = getattr(self, name, None)
+            if component is not None and hasattr(component, "seed"):
+                component.seed(self.spawn_seed())
+        if env is not None:
+            self.seed_env(env)
+        self.components_seeded = True
+
+    def seed_env(self, env):
+        """Seed an environment, and its action space, with a new child seed of the agent"""
+        seed = int(self.spawn_seed().generate_state(1)[0])
+        if hasattr(env, "seed"):
+            env.seed(seed)
+        if hasattr(env.action_space, "seed"):
+            env.action_space.seed(seed)
 
     def compile(self):
         """Compile an agent: Create the internal variables and populate the variables objects."""
@@ -51,6 +87,8 @@ class RLAgent(Agent):
              reward_scaling=1.,
              plots=False,
              tensorboard=False,
+             copy_observations=None,
+             reseed_env=False,
              **kwargs):
         """
         Run steps until termination.
@@ -74,6 +112,12 @@ class RLAgent(Agent):
         :param reward_scaling:
         :param plots: Plot metrics during training.
         :param tensorboard: Export metrics to tensorboard.
+        :param bool copy_observations: Take a copy of each observation returned by `env.step`. The observations returned by `env.reset` are always copied.
+            If False, the observations are passed by reference, and only copied by the memory when stored (see :attr:`rl.memory.Memory.copies_observations`).
+            This is only safe for environments which don't modify in place the observations they returned (see :func:`rl.utils.env.mutates_observations`).
+            Defaults to True only if the memory of the agent doesn't copy the observations, so that they are copied exactly once.
+        :param bool reseed_env: Seed again the environment with a new child seed of the agent at the beginning of the run (see :meth:`seed_env`).
+            By default, the environment is only seeded at the first run of the agent, with its random components.
         """
         if not self.compiled:
             raise RuntimeError(
@@ -82,6 +126,18 @@ class RLAgent(Agent):
         if action_repetition < 1:
             raise ValueError('action_repetition must be >= 1, is {}'.format(
                 action_repetition))
+        memory_copies_observations = getattr(getattr(self, "memory", None), "copies_observations", False)
+        if copy_observations is None:
+            copy_observations = not memory_copies_observations
+        elif not copy_observations and not memory_copies_observations:
+            warnings.warn(
+                'The memory of the agent doesn\'t copy the observations it stores, they will be modified if the environment reuses them. Consider using `copy_observations=True`.'
+            )
+        if copy_observations:
+            own_observation = copy_observation
+        else:
+            def own_observation(observation):
+                return (observation)
 
         # Process the different cases when either nb_steps or nb_episodes are specified
         if (nb_steps is None and nb_episodes is None):
@@ -97,6 +153,11 @@ class RLAgent(Agent):
                 "Please specify one (and only one) of nb_steps or nb_episodes")
                    )
 
+        if not self.components_seeded:
+            self.seed_components(env)
+        elif reseed_env:
+            self.seed_env(env)
+
         self.training = train
         # We explore only if the flag is selected and we are in train mode
         self.exploration = (train and exploration)
@@ -136,6 +197,8 @@ class RLAgent(Agent):
             callbacks.set_params(params)
         else:
             callbacks._set_params(params)
+        # Skip the per-step dispatch (and the collection of its logs) if no callback consumes it
+        step_callbacks = callbacks.has_step_callbacks
 
         # Add run hooks
         if tensorboard:
@@ -179,6 +242,13 @@ class RLAgent(Agent):
         self.observation_1 = None
         self.action = None
         self.step_summaries = None
+        # Step records, reused at each step
+        accumulated_info = {}
+        step_logs = {
+            # For legacy callbacks upport
+            'metrics': [],
+            'info': accumulated_info,
+        }
 
         # Run_init hooks
         self.hooks.run_init()
@@ -198,7 +268,7 @@ class RLAgent(Agent):
 
                 # Obtain the initial observation by resetting the environment.
                 self.reset_states()
-                observation_0 = deepcopy(env.reset())
+                observation_0 = copy_observation(env.reset())
                 assert observation_0 is not None
 
                 # Perform random steps at beginning of episode and do not record them into the experience.
@@ -224,10 +294,11 @@ class RLAgent(Agent):
             self.episode_step += 1
             self.reward = 0.
             self.step_summaries = []
-            accumulated_info = {}
 
             # Run a single step.
-            callbacks.on_step_begin(self.episode_step)
+            if step_callbacks:
+                accumulated_info.clear()
+                callbacks.on_step_begin(self.episode_step)
             # This is were all of the work happens. We first perceive and compute the action
             # (forward step) and then use the reward to improve (backward step).
 
@@ -238,17 +309,20 @@ class RLAgent(Agent):
             # Apply the action
             # With repetition, if necesarry
             for _ in range(action_repetition):
-                callbacks.on_action_begin(self.action)
-                self.observation_1, r, self.done, info = env.step(self.action)
-                # observation_1 = deepcopy(observation_1)
-
-                for key, value in info.items():
-                    if not np.isreal(value):
-                        continue
-                    if key not in accumulated_info:
-                        accumulated_info[key] = np.zeros_like(value)
-                    accumulated_info[key] += value
-                callbacks.on_action_end(self.action)
+                if step_callbacks:
+                    callbacks.on_action_begin(self.action)
+                observation_1, r, self.done, info = env.step(self.action)
+                self.observation_1 = own_observation(observation_1)
+
+                if step_callbacks:
+                    for key, value in info.items():
+                        if not np.isreal(value):
+                            continue
+                        if key in accumulated_info:
+                            accumulated_info[key] = accumulated_info[key] + value
+                        else:
+                            accumulated_info[key] = value
+                    callbacks.on_action_end(self.action)
 
                 self.reward += r
 
@@ -275,16 +349,12 @@ class RLAgent(Agent):
 
             # Callbacks
             # Collect statistics
-            step_logs = {
-                'action': self.action,
-                'observation': self.observation_1,
-                'reward': self.reward,
-                # For legacy callbacks upport
-                'metrics': [],
-                'episode': self.episode,
-                'info': accumulated_info,
-            }
-            callbacks.on_step_end(self.episode_step, step_logs)
+            if step_callbacks:
+                step_logs['action'] = self.action
+                step_logs['observation'] = self.observation_1
+                step_logs['reward'] = self.reward
+                step_logs['episode'] = self.episode
+                callbacks.on_step_end(self.episode_step, step_logs)
 
             # Episodic callbacks
             if self.done:
@@ -309,7 +379,7 @@ class RLAgent(Agent):
 
     def _perform_random_steps(self, nb_max_start_steps, start_step_policy, env,
                               observation, callbacks):
-        nb_random_start_steps = np.random.randint(nb_max_start_steps)
+        nb_random_start_steps = self.random_state.integers(nb_max_start_steps)
         for _ in range(nb_random_start_steps):
             if start_step_policy is None:
                 action = env.action_space.sample()
@@ -317,14 +387,14 @@ class RLAgent(Agent):
                 action = start_step_policy(observation)
             callbacks.on_action_begin(action)
             observation, reward, done, info = env.step(action)
-            observation = deepcopy(observation)
+            observation = copy_observation(observation)
             callbacks.on_action_end(action)
 
             if done:
                 warnings.warn(
                     'Env ended before {} random steps could be performed at the start. You should probably lower the `nb_max_start_steps` parameter.'.
                     format(nb_random_start_steps))
-                observation = deepcopy(env.reset())
+                observation = copy_observation(env.reset())
                 break
         return (observation)
 
@@ -337,6 +407,8 @@ class RLAgent(Agent):
                       **kwargs):
         """Train the networks in offline mode"""
 
+        if not self.components_seeded:
+            self.seed_components()
         self.training = True
         self.done = True
         self.run_number += 1
@@ -419,6 +491,22 @@ class RLAgent(Agent):
         """
         raise (NotImplementedError())
 
+    def hard_update_targets(self):
+        """Copy the weights of the controllers into their target networks"""
+        raise (NotImplementedError())
+
+    def get_weights(self):
+        """
+        Get a copy of the weights of the agent
+
+        :return: A dictionary of lists of arrays, e.g. `{"actor": [...], "critic": [...]}`
+        """
+        raise NotImplementedError()
+
+    def set_weights(self, weights):
+        """Set the weights of the agent, as returned by :meth:`get_weights`"""
+        raise NotImplementedError()
+
     def load_weights(self, filepath):
         """
         Loads the weights of an agent from an HDF5 file.
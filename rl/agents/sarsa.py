@@ -6,20 +6,20 @@ from keras.callbacks import History
 from keras.layers import Input, Lambda
 import keras.backend as K
 
-from rl.agent import Agent
+from rl.agents.rlagent import RLAgent
 from rl.agents.dqn import mean_q
-from rl.util import huber_loss
+from rl.utils.numerics import huber_loss
 from rl.policy import EpsGreedyQPolicy, GreedyQPolicy
-from rl.util import get_object_config
-from rl.keras_future import Model
+from rl.utils.model import get_object_config
+from rl.legacy.keras_future import Model
 
 
-class SARSAAgent(Agent):
+class SARSAAgent(RLAgent):
     """Write me
     """
     def __init__(self, model, nb_actions, policy=None, test_policy=None, gamma=.99, nb_steps_warmup=10,
-                 train_interval=1, delta_clip=np.inf, *args, **kwargs):
-        super(SarsaAgent, self).__init__(*args, **kwargs)
+                 train_interval=1, delta_clip=np.inf, processor=None, *args, **kwargs):
+        super(SARSAAgent, self).__init__(*args, **kwargs)
 
         # Do not use defaults in constructor because that would mean that each instance shares the same
         # policy.
@@ -29,6 +29,7 @@ class SARSAAgent(Agent):
             test_policy = GreedyQPolicy()
 
         self.model = model
+        self.processor = processor
         self.nb_actions = nb_actions
         self.policy = policy
         self.test_policy = test_policy
@@ -60,7 +61,7 @@ class SARSAAgent(Agent):
         return self.processor.process_state_batch(batch)
 
     def get_config(self):
-        config = super(SarsaAgent, self).get_config()
+        config = super(SARSAAgent, self).get_config()
         config['nb_actions'] = self.nb_actions
         config['gamma'] = self.gamma
         config['nb_steps_warmup'] = self.nb_steps_warmup
@@ -130,6 +131,19 @@ class SARSAAgent(Agent):
 
         return action
 
+    def select_actions(self, state_batch, **kwargs):
+        """
+        Select the actions of a batch of states (e.g. of parallel environments), with a single prediction and a single policy call
+
+        :param kwargs: Other parameters of the `select_actions` method of the policy, e.g. the `steps` of a :class:`rl.policy.LinearAnnealedPolicy`
+        :return: The actions, of shape `(batch_size,)`, not processed by the processor
+        """
+        q_values = self.compute_batch_q_values(state_batch)
+        if self.training:
+            return self.policy.select_actions(q_values=q_values, **kwargs)
+        else:
+            return self.test_policy.select_actions(q_values=q_values, **kwargs)
+
     def backward(self, reward, terminal):
         metrics = [np.nan for _ in self.metrics_names]
         if not self.training:
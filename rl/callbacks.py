@@ -9,6 +9,8 @@ import numpy as np
 from keras.callbacks import Callback as KerasCallback, CallbackList as KerasCallbackList
 from keras.utils.generic_utils import Progbar
 
+from rl.utils.checkpoint import CheckpointManager
+
 
 class Callback(KerasCallback):
     """
@@ -38,57 +40,100 @@ class Callback(KerasCallback):
         pass
 
 
+def _is_default(callback, method_name, base):
+    """Whether the method `method_name` of `callback` is the no-op inherited from `base`"""
+    # Methods can also be given at the instance level (e.g. keras's LambdaCallback)
+    if method_name in vars(callback):
+        return False
+    method = getattr(type(callback), method_name, None)
+    default = getattr(base, method_name, None)
+    # Compare the underlying functions, for python2 unbound methods
+    return getattr(method, "__func__", method) is getattr(default, "__func__", default)
+
+
+def _resolve_handler(callback, method_name, fallback_name=None):
+    """
+    Get the bound method of `callback` handling an event, or None if the callback ignores it.
+
+    :param callback: The callback object
+    :param str method_name: The vinci method handling the event (e.g. `on_step_end`)
+    :param str fallback_name: The keras method to fall back to, if the callback doesn't define `method_name` (e.g. `on_batch_end`)
+    """
+    if callable(getattr(callback, method_name, None)):
+        if _is_default(callback, method_name, Callback):
+            return None
+        return getattr(callback, method_name)
+    elif fallback_name is not None:
+        if _is_default(callback, fallback_name, KerasCallback):
+            return None
+        return getattr(callback, fallback_name)
+    else:
+        return None
+
+
 class CallbackList(KerasCallbackList):
+    """
+    A list of callbacks, dispatching the events to each of them.
+
+    The method handling each event is resolved once per callback, when the list is built.
+    Dispatching an event then only loops over the callbacks which actually implement it.
+    Callbacks that don't define the vinci events fall back to the keras ones (e.g. `on_step_end` to `on_batch_end`).
+
+    The `logs` dicts given to the step events are reused between steps: Callbacks must copy them if they want to keep them.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CallbackList, self).__init__(*args, **kwargs)
+        self._resolve_handlers()
+
+    def append(self, callback):
+        super(CallbackList, self).append(callback)
+        self._resolve_handlers()
+
+    def _resolve_handlers(self):
+        def handlers(method_name, fallback_name=None):
+            resolved = [_resolve_handler(callback, method_name, fallback_name) for callback in self.callbacks]
+            return [handler for handler in resolved if handler is not None]
+
+        self._episode_begin_handlers = handlers("on_episode_begin", "on_epoch_begin")
+        self._episode_end_handlers = handlers("on_episode_end", "on_epoch_end")
+        self._step_begin_handlers = handlers("on_step_begin", "on_batch_begin")
+        self._step_end_handlers = handlers("on_step_end", "on_batch_end")
+        self._action_begin_handlers = handlers("on_action_begin")
+        self._action_end_handlers = handlers("on_action_end")
+
+    @property
+    def has_step_callbacks(self):
+        """Whether at least one callback consumes the step (or action) events"""
+        return bool(self._step_begin_handlers or self._step_end_handlers or self._action_begin_handlers or self._action_end_handlers)
+
     def _set_env(self, env):
         for callback in self.callbacks:
             if callable(getattr(callback, '_set_env', None)):
                 callback._set_env(env)
 
     def on_episode_begin(self, episode, logs={}):
-        for callback in self.callbacks:
-            # Check if callback supports the more appropriate `on_episode_begin` callback.
-            # If not, fall back to `on_epoch_begin` to be compatible with built-in Keras callbacks.
-            if callable(getattr(callback, 'on_episode_begin', None)):
-                callback.on_episode_begin(episode, logs=logs)
-            else:
-                callback.on_epoch_begin(episode, logs=logs)
+        for handler in self._episode_begin_handlers:
+            handler(episode, logs=logs)
 
     def on_episode_end(self, episode, logs={}):
-        for callback in self.callbacks:
-            # Check if callback supports the more appropriate `on_episode_end` callback.
-            # If not, fall back to `on_epoch_end` to be compatible with built-in Keras callbacks.
-            if callable(getattr(callback, 'on_episode_end', None)):
-                callback.on_episode_end(episode, logs=logs)
-            else:
-                callback.on_epoch_end(episode, logs=logs)
+        for handler in self._episode_end_handlers:
+            handler(episode, logs=logs)
 
     def on_step_begin(self, step, logs={}):
-        for callback in self.callbacks:
-            # Check if callback supports the more appropriate `on_step_begin` callback.
-            # If not, fall back to `on_batch_begin` to be compatible with built-in Keras callbacks.
-            if callable(getattr(callback, 'on_step_begin', None)):
-                callback.on_step_begin(step, logs=logs)
-            else:
-                callback.on_batch_begin(step, logs=logs)
+        for handler in self._step_begin_handlers:
+            handler(step, logs=logs)
 
     def on_step_end(self, step, logs={}):
-        for callback in self.callbacks:
-            # Check if callback supports the more appropriate `on_step_end` callback.
-            # If not, fall back to `on_batch_end` to be compatible with built-in Keras callbacks.
-            if callable(getattr(callback, 'on_step_end', None)):
-                callback.on_step_end(step, logs=logs)
-            else:
-                callback.on_batch_end(step, logs=logs)
+        for handler in self._step_end_handlers:
+            handler(step, logs=logs)
 
     def on_action_begin(self, action, logs={}):
-        for callback in self.callbacks:
-            if callable(getattr(callback, 'on_action_begin', None)):
-                callback.on_action_begin(action, logs=logs)
+        for handler in self._action_begin_handlers:
+            handler(action, logs=logs)
 
     def on_action_end(self, action, logs={}):
-        for callback in self.callbacks:
-            if callable(getattr(callback, 'on_action_end', None)):
-                callback.on_action_end(action, logs=logs)
+        for handler in self._action_end_handlers:
+            handler(action, logs=logs)
 
 
 class TestLogger(Callback):
@@ -261,7 +306,8 @@ class TrainIntervalLogger(Callback):
 
     def on_step_end(self, step, logs):
         if self.info_names is None:
-            self.info_names = logs['info'].keys()
+            # Copy the keys, since the info dict is reused between steps
+            self.info_names = list(logs['info'].keys())
         values = [('reward', logs['reward'])]
         self.progbar.update(
             (self.step % self.interval), values=values, force=True)
@@ -352,12 +398,42 @@ class Visualizer(Callback):
 
 
 class ModelIntervalCheckpoint(Callback):
-    def __init__(self, filepath, interval, verbose=0):
+    """
+    Save the weights of the agent every `interval` steps
+
+    :param str filepath: Path of the weights, formatted with the step and the logs.
+        In asynchronous mode, directory of the checkpoints.
+    :param bool asynchronous: Snapshot the weights in memory (with `get_weights`, e.g. :meth:`rl.agents.ddpg.DDPGAgent.get_weights`),
+        and write them in a background thread (see :class:`rl.utils.checkpoint.CheckpointManager`), which is stopped at the end of each run.
+    :param int max_to_keep: In asynchronous mode, number of checkpoints kept
+    """
+    def __init__(self, filepath, interval, verbose=0, asynchronous=False, max_to_keep=5):
         super(ModelIntervalCheckpoint, self).__init__()
         self.filepath = filepath
         self.interval = interval
         self.verbose = verbose
         self.total_steps = 0
+        self.asynchronous = asynchronous
+        self.manager = None
+        if asynchronous:
+            self.manager = CheckpointManager(filepath, max_to_keep=max_to_keep)
+
+    def set_model(self, model):
+        # Imported here, since the agents import the callbacks
+        from rl.agents.rlagent import RLAgent
+        if self.asynchronous and (not callable(getattr(model, "get_weights", None)) or
+                                  (isinstance(model, RLAgent) and _is_default(model, "get_weights", RLAgent))):
+            raise ValueError(
+                'Asynchronous checkpoints need an agent implementing `get_weights`, which {} does not.'.format(type(model).__name__))
+        self.model = model
+
+    # Older keras versions
+    _set_model = set_model
+
+    def on_train_begin(self, logs):
+        if self.asynchronous:
+            # The thread is stopped at the end of the previous run
+            self.manager.start()
 
     def on_step_end(self, step, logs={}):
         self.total_steps += 1
@@ -365,8 +441,21 @@ class ModelIntervalCheckpoint(Callback):
             # Nothing to do.
             return
 
+        if self.asynchronous:
+            if self.verbose > 0:
+                print('Step {}: checkpointing model to {}'.format(self.total_steps, self.filepath))
+            weights = self.model.get_weights()
+            if not isinstance(weights, dict):
+                weights = {"model": weights}
+            self.manager.save(weights, step=self.total_steps, episode=logs.get('episode'))
+            return
+
         filepath = self.filepath.format(step=self.total_steps, **logs)
         if self.verbose > 0:
             print('Step {}: saving model to {}'.format(self.total_steps,
                                                        filepath))
         self.model.save_weights(filepath, overwrite=True)
+
+    def on_train_end(self, logs):
+        if self.asynchronous:
+            self.manager.close()
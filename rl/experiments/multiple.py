@@ -2,13 +2,19 @@ from rl.runtime.experiment import Experiment, RootExperiment
 from ..hooks import ExperimentsHooksContainer
 from ..utils.printer import print_info
 from rl.runtime.runtime import runtime
+from rl.random import get_seed_sequence, spawn_seed
 
 
 class MultipleExperiments(object):
-    """Abstract class to manage multiple experiments"""
-    def __init__(self, name, hooks=None, force=False, path="./experiments"):
+    """
+    Abstract class to manage multiple experiments
+
+    :param seed: Root seed of the experiments (see :func:`rl.random.get_seed_sequence`). Each experiment gets an independent child seed.
+    """
+    def __init__(self, name, hooks=None, force=False, path="./experiments", seed=None):
         self.name = str(name)
         self.id = name
+        self.seed_sequence = get_seed_sequence(seed)
 
         self.done = False
         self.experiment_count = 0
@@ -35,7 +41,8 @@ class MultipleExperiments(object):
         for _ in range(1, number + 1):
             self.experiment_count += 1
             print_info("Experiment {}/{}".format(self.experiment_count, number))
-            experiment = Experiment(experiment_id=self.name + "/" + str(self.experiment_count), experiments=self, path=self._path)
+            experiment = Experiment(experiment_id=self.name + "/" + str(self.experiment_count), experiments=self, path=self._path,
+                                    seed=spawn_seed(self.seed_sequence))
             with experiment:
                 yield experiment
 
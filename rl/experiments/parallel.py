@@ -1,14 +1,22 @@
 import multiprocessing
+import random
+
+import numpy as np
 
 from .multiple import MultipleExperiments
 from rl.runtime.experiment import Experiment
 from rl.utils.printer import print_info
 from rl.hooks.arrays import ExperimentArrayHook
+from rl.random import spawn_seed
 
 
 class ParallelExperiments(MultipleExperiments):
     def experiments(self, number, script_function, nb_processes=16):
-        """Execute the given function in different subprocesses"""
+        """
+        Execute the given function in different subprocesses
+
+        Each experiment gets an independent child seed of the experiments, which also seeds the global random states of its process.
+        """
         print_info("Beginning {} experiments".format(number))
 
         for experiment_count in range(1, number + 1):
@@ -16,7 +24,8 @@ class ParallelExperiments(MultipleExperiments):
             experiment_id = str(experiment_count)
             experiment_id_full = (self.name + "/" + experiment_id)
 
-            experiment = Experiment(experiment_id=experiment_id_full, experiments=self, path=self._path, hooks=[ExperimentArrayHook()])
+            experiment = Experiment(experiment_id=experiment_id_full, experiments=self, path=self._path, hooks=[ExperimentArrayHook()],
+                                    seed=spawn_seed(self.seed_sequence))
 
             # Run the experiment in a separate process
             experiment_process = multiprocessing.Process(name=experiment_id, target=experiment_function, args=(script_function, experiment))
@@ -24,5 +33,9 @@ class ParallelExperiments(MultipleExperiments):
 
 
 def experiment_function(script_function, experiment):
+    # The forked processes inherit the same global random states: make them independent
+    seed = experiment.seed_sequence.generate_state(1)[0]
+    np.random.seed(seed)
+    random.seed(int(seed))
     with experiment:
         script_function(experiment)
@@ -38,6 +38,14 @@ class AgentHooksContainer(HooksContainer):
         for hook in self.hooks:
             hook.episode_end()
 
+    def batch_init(self):
+        for hook in self.hooks:
+            hook.batch_init()
+
+    def batch_end(self):
+        for hook in self.hooks:
+            hook.batch_end()
+
     def run_init(self):
         for hook in self.hooks:
             hook.run_init()
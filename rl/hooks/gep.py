@@ -40,6 +40,20 @@ class GEPHook(Hook):
         df = pd.DataFrame({"errors": errors, "rewards": rewards, "goals": goals, "training": istraining, "training_steps": training_steps}, index=steps)
         df.to_pickle(self.endpoint + "data.p")
 
+    def batch_end(self):
+        # Save the whole batch at once
+        columns = {
+            "policies": list(self.agent.policies),
+            "rewards": self.agent.episode_rewards,
+            "achievements": list(self.agent.achievements)
+        }
+        # A batch of motor babbling has no goals
+        if self.agent.goals is not None:
+            columns["goals"] = list(self.agent.goals)
+            columns["errors"] = self.agent.errors
+        df = pd.DataFrame(columns)
+        df.to_pickle(self.endpoint + "batch_{}.p".format(self.agent.episode))
+
 
 class RunGEPHook(GEPHook):
     def run_init(self):
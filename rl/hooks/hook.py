@@ -27,6 +27,16 @@ class Hook(object):
     * agent.achievement
     * agent.error
 
+    At the end of a batch of episodes (e.g. :meth:`rl.agents.gep.GEPAgent.test_goals`, or a parallel :meth:`rl.agents.gep.GEPAgent.bootstrap`),
+    these arrays are available, `goals` and `errors` being None for a batch without goals (e.g. motor babbling):
+    * agent.goals
+    * agent.policies
+    * agent.achievements
+    * agent.errors
+    * agent.episode_rewards
+
+    A batch is run outside of the runs: it is surrounded by `batch_init` and `batch_end`, instead of `run_init` and `run_end`.
+
     :param agent: the RL agent
     :param episodic: Whether the hook will use episode information
     """
@@ -52,6 +62,14 @@ class Hook(object):
     def episode_end(self):
         pass
 
+    def batch_init(self):
+        """Callback that is called at the beginning of a batch of episodes"""
+        pass
+
+    def batch_end(self):
+        """Callback that is called at the end of a batch of episodes"""
+        pass
+
     def run_init(self):
         pass
 
@@ -14,6 +14,8 @@ class PortraitHook(Hook):
         # Distribution
         self.endpoint_actor_distribution = self.experiment.endpoint("figures/distribution/actor")
         self.endpoint_critic_distribution = self.experiment.endpoint("figures/distribution/critic")
+        # Spawned once, so that plotting doesn't shift the seeds later spawned by the agent
+        self.distribution_seed = self.agent.spawn_seed()
 
     def episode_end(self):
         print("Plotting portrait")
@@ -47,7 +49,8 @@ class PortraitHook(Hook):
             self.agent.critic,
             self.agent.env,
             actor_file=(self.endpoint_actor_distribution + file_name),
-            critic_file=(self.endpoint_actor_distribution + file_name))
+            critic_file=(self.endpoint_actor_distribution + file_name),
+            seed=self.distribution_seed)
 
 
 class TrajectoryHook(Hook):
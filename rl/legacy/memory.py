@@ -1,17 +1,23 @@
 from collections import deque
-from rl.utils.memory import zeroed_observation, RingBuffer, sample_batch_indexes
-from rl.memory import Experience
+from rl.utils.memory import zeroed_observation, RingBuffer, ArrayRingBuffer, sample_batch_indexes
+from rl.memory import Batch, NStepBatch
+from rl.random import get_generator
 import numpy as np
 
 
 class Memory(object):
-    def __init__(self, window_length, ignore_episode_boundaries=False):
+    def __init__(self, window_length, ignore_episode_boundaries=False, seed=None):
         self.window_length = window_length
         self.ignore_episode_boundaries = ignore_episode_boundaries
+        self.random_state = get_generator(seed)
 
         self.recent_observations = deque(maxlen=window_length)
         self.recent_terminals = deque(maxlen=window_length)
 
+    def seed(self, seed=None):
+        """Replace the random generator of the memory (see :func:`rl.random.get_generator`)"""
+        self.random_state = get_generator(seed)
+
     def sample(self, batch_size, batch_idxs=None):
         raise NotImplementedError()
 
@@ -48,6 +54,11 @@ class Memory(object):
 
 
 class SequentialMemory(Memory):
+    """
+    A memory of consecutive observations, whose states are windows of the last `window_length` observations
+
+    The columns are stored in numpy arrays, and the batches are gathered at once with arrays of indexes.
+    """
     def __init__(self, limit, **kwargs):
         super(SequentialMemory, self).__init__(**kwargs)
 
@@ -55,71 +66,119 @@ class SequentialMemory(Memory):
 
         # Do not use deque to implement the memory. This data structure may seem convenient but
         # it is way too slow on random access. Instead, we use our own ring buffer implementation.
-        self.actions = RingBuffer(limit)
-        self.rewards = RingBuffer(limit)
-        self.terminals = RingBuffer(limit)
-        self.observations = RingBuffer(limit)
+        self.actions = ArrayRingBuffer(limit)
+        self.rewards = ArrayRingBuffer(limit, dtype=float)
+        self.terminals = ArrayRingBuffer(limit, dtype=bool)
+        self.observations = ArrayRingBuffer(limit)
 
-    def sample(self, batch_size, batch_idxs=None):
+    def sample_idxs(self, batch_size, batch_idxs=None):
         if batch_idxs is None:
             # Draw random indexes such that we have at least a single entry before each
             # index.
             batch_idxs = sample_batch_indexes(
-                0, self.nb_entries - 1, size=batch_size)
+                0, self.nb_entries - 1, size=batch_size, random_state=self.random_state)
         batch_idxs = np.array(batch_idxs) + 1
         assert np.min(batch_idxs) >= 1
         assert np.max(batch_idxs) < self.nb_entries
         assert len(batch_idxs) == batch_size
 
-        # Create experiences
-        experiences = []
-        for idx in batch_idxs:
-            terminal0 = self.terminals[idx - 2] if idx >= 2 else False
-            while terminal0:
-                # Skip this transition because the environment was reset here. Select a new, random
-                # transition and use this instead. This may cause the batch to contain the same
-                # transition twice.
-                idx = sample_batch_indexes(1, self.nb_entries, size=1)[0]
-                terminal0 = self.terminals[idx - 2] if idx >= 2 else False
-            assert 1 <= idx < self.nb_entries
-
-            # This code is slightly complicated by the fact that subsequent observations might be
-            # from different episodes. We ensure that an experience never spans multiple episodes.
-            # This is probably not that important in practice but it seems cleaner.
-            state0 = [self.observations[idx - 1]]
-            for offset in range(0, self.window_length - 1):
-                current_idx = idx - 2 - offset
-                current_terminal = self.terminals[
-                    current_idx - 1] if current_idx - 1 > 0 else False
-                if current_idx < 0 or (not self.ignore_episode_boundaries and
-                                       current_terminal):
-                    # The previously handled observation was terminal, don't add the current one.
-                    # Otherwise we would leak into a different episode.
-                    break
-                state0.insert(0, self.observations[current_idx])
-            while len(state0) < self.window_length:
-                state0.insert(0, zeroed_observation(state0[0]))
-            action = self.actions[idx - 1]
-            reward = self.rewards[idx - 1]
-            terminal1 = self.terminals[idx - 1]
-
-            # Okay, now we need to create the follow-up state. This is state0 shifted on timestep
-            # to the right. Again, we need to be careful to not include an observation from the next
-            # episode if the last state is terminal.
-            state1 = [np.copy(x) for x in state0[1:]]
-            state1.append(self.observations[idx])
-
-            assert len(state0) == self.window_length
-            assert len(state1) == len(state0)
-            experiences.append(
-                Experience(
-                    state0=state0,
-                    action=action,
-                    reward=reward,
-                    state1=state1,
-                    terminal1=terminal1))
-        assert len(experiences) == batch_size
-        return experiences
+        # Skip the transitions where the environment was reset. Select new, random
+        # transitions and use them instead. This may cause the batch to contain the same
+        # transition twice.
+        invalid = self._terminal0(batch_idxs)
+        while invalid.any():
+            batch_idxs[invalid] = sample_batch_indexes(1, self.nb_entries, size=np.count_nonzero(invalid), random_state=self.random_state)
+            invalid[invalid] = self._terminal0(batch_idxs[invalid])
+        return batch_idxs
+
+    def _terminal0(self, idxs):
+        """Whether the observation before the transitions `idxs` is terminal"""
+        terminal0 = np.zeros(len(idxs), dtype=bool)
+        previous = idxs >= 2
+        terminal0[previous] = self.terminals.take(idxs[previous] - 2)
+        return terminal0
+
+    def get_states(self, idxs):
+        """
+        Get the states before and after the transitions `idxs`, without the observations of other episodes
+
+        :return: `(state0, state1)`, arrays of shape `(len(idxs), window_length) + observation_shape`.
+            The observations missing at the beginning of the episodes are zeroed.
+        """
+        idxs = np.asarray(idxs)
+        # Observations of the window of state0, from the oldest to the most recent one: `idxs - window_length` to `idxs - 1`
+        offsets = np.arange(-self.window_length, 0)
+        window_idxs = idxs[:, np.newaxis] + offsets
+        # An observation of the window is kept if the observations between it and the most recent one don't begin an episode.
+        # This is probably not that important in practice but it seems cleaner.
+        breaks = window_idxs < 0
+        if not self.ignore_episode_boundaries:
+            # The observation following a terminal one begins an episode (the terminal of the first entry is ignored)
+            previous_idxs = window_idxs - 1
+            terminal = np.zeros(window_idxs.shape, dtype=bool)
+            has_previous = previous_idxs > 0
+            terminal[has_previous] = self.terminals.take(previous_idxs[has_previous])
+            # The most recent observation is always kept
+            terminal[:, -1] = False
+            breaks |= terminal
+        # Propagate the breaks to the older observations
+        kept = ~np.flip(np.logical_or.accumulate(np.flip(breaks, axis=1), axis=1), axis=1)
+
+        observations = self.observations.take(np.where(kept, window_idxs, 0))
+        kept = kept.reshape(kept.shape + (1, ) * (observations.ndim - 2))
+        state0 = np.where(kept, observations, 0)
+        # The follow-up state is state0 shifted by one step, ending with the next observation.
+        # It doesn't include an observation from the next episode if the last state is terminal.
+        state1 = np.concatenate([state0[:, 1:], self.observations.take(idxs)[:, np.newaxis]], axis=1)
+        return (state0, state1)
+
+    def get_state0(self, idx):
+        return (list(self.get_states([idx])[0][0]))
+
+    def get_state1(self, idx):
+        return (list(self.get_states([idx])[1][0]))
+
+    def sample(self, batch_size, batch_idxs=None):
+        idxs = self.sample_idxs(batch_size, batch_idxs)
+        state0, state1 = self.get_states(idxs)
+        return Batch(
+            state0=state0,
+            action=self.actions.take(idxs - 1),
+            reward=self.rewards.take(idxs - 1),
+            state1=state1,
+            terminal1=self.terminals.take(idxs - 1))
+
+    def sample_nstep(self, batch_size, n_step, gamma, batch_idxs=None):
+        """
+        Get a sample of n-step transitions, truncated at the end of the episodes
+
+        :return: A :class:`rl.memory.NStepBatch` object
+        """
+        idxs = self.sample_idxs(batch_size, batch_idxs)
+        # Accumulate the discounted rewards until the end of the episode or of the memory
+        steps = np.arange(n_step)
+        step_idxs = idxs[:, np.newaxis] - 1 + steps
+        valid = step_idxs < self.nb_entries - 1
+        # The first step is always valid
+        valid[:, 0] = True
+        terminals = self.terminals.take(np.where(valid, step_idxs, 0)) & valid
+        # The steps after a terminal one are not valid
+        valid[:, 1:] &= ~np.logical_or.accumulate(terminals, axis=1)[:, :-1]
+        nb_steps = np.sum(valid, axis=1)
+
+        rewards = self.rewards.take(np.where(valid, step_idxs, 0))
+        reward = np.sum(gamma ** steps * rewards * valid, axis=1)
+        last_idxs = idxs + nb_steps - 1
+        terminal1 = self.terminals.take(last_idxs - 1)
+        state0 = self.get_states(idxs)[0]
+        state1 = self.get_states(last_idxs)[1]
+        return NStepBatch(
+            state0=state0,
+            action=self.actions.take(idxs - 1),
+            reward=reward,
+            state1=state1,
+            terminal1=terminal1,
+            discount=np.where(terminal1, 0., gamma ** nb_steps))
 
     def append(self, observation_0, action, reward, observation_1, terminal, training=True):
         super(SequentialMemory, self).append(
@@ -158,7 +217,7 @@ class EpisodeParameterMemory(Memory):
     def sample(self, batch_size, batch_idxs=None):
         if batch_idxs is None:
             batch_idxs = sample_batch_indexes(
-                0, self.nb_entries, size=batch_size)
+                0, self.nb_entries, size=batch_size, random_state=self.random_state)
         assert len(batch_idxs) == batch_size
 
         batch_params = []
@@ -1,26 +1,44 @@
 from __future__ import absolute_import
 from collections import namedtuple
-from rl.utils.memory import RingBuffer, sample_batch_indexes
+from rl.utils.memory import sample_batch_indexes, ObservationCodec
+from rl.random import get_generator
 import numpy as np
 import pickle
 
 # This is to be understood as a transition: Given `state0`, performing `action`
 # yields `reward` and results in `state1`, which might be `terminal`.
+# `episode_start` tells whether `state0` begins a new episode, instead of following the previously stored experience.
+# It defaults to False: the experience then only begins a new episode if the previous one is terminal.
 Experience = namedtuple('Experience',
-                        'state0, action, reward, state1, terminal1')
+                        'state0, action, reward, state1, terminal1, episode_start')
+Experience.__new__.__defaults__ = (False, )
 
 # A batch
 # It stores data element-wise, instead of experience-wise
 Batch = namedtuple("Batch", ("state0", "action", "reward", "state1",
                              "terminal1"))
 
+# A batch of n-step transitions
+# `reward` is the discounted sum of the rewards of the (up to) n steps, `state1` the state to bootstrap from,
+# and `discount` the factor to apply to its value: gamma ** (number of steps), or 0 if `state1` is terminal
+NStepBatch = namedtuple("NStepBatch", Batch._fields + ("discount", ))
+
 
 class Memory(object):
     """
     Abstract memory class
     """
-    def __init__(self, env):
+    #: Whether :func:`append` copies the observations into the memory's own storage.
+    #: If so, the caller can give references to arrays that will later be modified (e.g. reused by the environment).
+    copies_observations = False
+
+    def __init__(self, env, seed=None):
         self.env = env
+        self.random_state = get_generator(seed)
+
+    def seed(self, seed=None):
+        """Replace the random generator of the memory (see :func:`rl.random.get_generator`)"""
+        self.random_state = get_generator(seed)
 
     def sample(self, batch_size):
         """
@@ -31,6 +49,26 @@ class Memory(object):
         """
         raise NotImplementedError()
 
+    def sample_nstep(self, batch_size, n_step, gamma):
+        """
+        Get a sample of n-step transitions from the memory
+
+        :param int batch_size: size of the batch
+        :param int n_step: Maximal number of steps of the transitions. They are truncated at the end of the episodes.
+        :param float gamma: Discount factor
+        :return: A :class:`NStepBatch` object
+        """
+        raise NotImplementedError()
+
+    def iterate_epoch(self, batch_size):
+        """
+        Iterate once over the memory, in random order, by batches
+
+        :param int batch_size: size of the batches
+        :return: An iterator of :class:`Batch` objects
+        """
+        raise NotImplementedError()
+
     def append(self, experience):
         """Add the experience to the memory"""
         raise NotImplementedError()
@@ -38,65 +76,213 @@ class Memory(object):
 
 class SimpleMemory(Memory):
     """
-    A simple memory directly storing experiences in a circular buffer
+    A simple memory storing experiences in a circular buffer
 
-    Data is stored directly as an array of :class:`Experience`"""
+    Data is stored column-wise, in arrays preallocated for `limit` experiences.
+    The observations are copied into these arrays when appended, encoded in the storage dtype,
+    and decoded when gathered in a batch.
+
+    :param seed: Seed of the random generator of the memory. It is replaced by a seed of the agent's hierarchy when used by an agent.
+    :param str storage_dtype: Storage dtype of the observations (see :class:`rl.utils.memory.ObservationCodec`).
+        With `"uint8"`, the observations are quantized between the bounds of the observation space.
+        The actions and rewards are stored as float32, unless `"float64"`.
+    """
+    copies_observations = True
 
-    def __init__(self, env, limit):
-        super(SimpleMemory, self).__init__(env)
-        self.buffer = RingBuffer(limit)
+    def __init__(self, env, limit, seed=None, storage_dtype="float32"):
+        super(SimpleMemory, self).__init__(env, seed=seed)
+        self.limit = limit
+        self.codec = ObservationCodec(storage_dtype,
+                                      low=getattr(env.observation_space, "low", None),
+                                      high=getattr(env.observation_space, "high", None))
+        float_dtype = np.float64 if storage_dtype == "float64" else np.float32
+        self.state0 = np.empty((limit, env.observation_space.dim), dtype=self.codec.dtype)
+        self.action = np.empty((limit, env.action_space.dim), dtype=float_dtype)
+        self.reward = np.empty((limit, 1), dtype=float_dtype)
+        self.terminal1 = np.empty((limit, 1), dtype=bool)
+        self.state1 = np.empty((limit, env.observation_space.dim), dtype=self.codec.dtype)
+        # Episode of each experience, used to find the episode boundaries
+        self.episode = np.empty(limit, dtype=np.int64)
+        self.current_episode = 0
+        # Position of the oldest experience in the arrays
+        self.start = 0
+        self.length = 0
+
+    def _positions(self, idxs):
+        """Convert indexes (0 being the oldest experience) to positions in the arrays"""
+        idxs = np.asarray(idxs)
+        if idxs.size > 0 and (idxs.min() < 0 or idxs.max() >= self.length):
+            raise KeyError("Invalid indexes {}, for a memory of length {}".format(idxs, self.length))
+        return ((self.start + idxs) % self.limit)
 
     def get_idxs(self, idxs, batch_size):
         """Get a non-contiguous series of indexes"""
-        # Allocate memory
-        state0_batch = np.empty((batch_size, self.env.observation_space.dim))
-        action_batch = np.empty((batch_size, self.env.action_space.dim))
-        reward_batch = np.empty((batch_size, 1))
-        terminal1_batch = np.empty((batch_size, 1), dtype=bool)
-        state1_batch = np.empty((batch_size, self.env.observation_space.dim))
-
-        for batch_index, memory_index in enumerate(idxs):
-            experience = self.buffer[memory_index]
-            state0_batch[batch_index, :] = experience.state0
-            action_batch[batch_index, :] = experience.action
-            reward_batch[batch_index, :] = experience.reward
-            terminal1_batch[batch_index, :] = experience.terminal1
-            state1_batch[batch_index, :] = experience.state1
+        positions = self._positions(idxs)
+        assert len(positions) == batch_size
 
         batch = Batch(
-            state0=state0_batch,
-            action=action_batch,
-            reward=reward_batch,
-            terminal1=terminal1_batch,
-            state1=state1_batch)
+            state0=self.codec.decode(self.state0[positions]),
+            action=self.action[positions],
+            reward=self.reward[positions],
+            terminal1=self.terminal1[positions],
+            state1=self.codec.decode(self.state1[positions]))
 
         return batch
 
-    def sample(self, batch_size, batch_idxs=None):
+    def sample_idxs(self, batch_size, batch_idxs=None):
+        """Draw (or validate) the indexes of a batch"""
         available_samples = len(self)
         if batch_size > available_samples:
             raise(IndexError("Not enough elements in the memory (currently {}) to sample a batch of size {}".format(len(self), batch_size)))
         if batch_idxs is None:
             # Draw random indexes such that we have at least a single entry before each
             # index.
-            batch_idxs = sample_batch_indexes(0, available_samples - 1, size=batch_size)
-        batch_idxs = np.array(batch_idxs) + 1
+            batch_idxs = sample_batch_indexes(0, available_samples - 1, size=batch_size, random_state=self.random_state)
+        return (np.array(batch_idxs) + 1)
 
+    def sample(self, batch_size, batch_idxs=None):
+        batch_idxs = self.sample_idxs(batch_size, batch_idxs)
         return (self.get_idxs(batch_idxs, batch_size=batch_size))
 
+    def iterate_epoch(self, batch_size, drop_last=True):
+        """
+        Iterate over a random permutation of the memory, by contiguous slices of `batch_size` experiences
+
+        :param bool drop_last: Skip the last batch if it is smaller than `batch_size`
+        """
+        permutation = self.random_state.permutation(self.length)
+        if drop_last:
+            end = self.length - self.length % batch_size
+        else:
+            end = self.length
+        for first in range(0, end, batch_size):
+            idxs = permutation[first:first + batch_size]
+            yield self.get_idxs(idxs, batch_size=len(idxs))
+
+    def sample_nstep(self, batch_size, n_step, gamma, batch_idxs=None):
+        batch_idxs = self.sample_idxs(batch_size, batch_idxs)
+
+        # Indexes of the (up to) n steps following each sampled index
+        step_idxs = batch_idxs[:, np.newaxis] + np.arange(n_step)
+        valid = (step_idxs < self.length)
+        positions = self._positions(np.minimum(step_idxs, self.length - 1))
+        # Truncate at the end of the episode
+        valid &= (self.episode[positions] == self.episode[positions[:, :1]])
+        nb_steps = np.sum(valid, axis=1)
+
+        discounts = gamma ** np.arange(n_step)
+        reward = np.sum(self.reward[positions, 0] * discounts * valid, axis=1, keepdims=True)
+        last_positions = positions[np.arange(batch_size), nb_steps - 1]
+        terminal1 = self.terminal1[last_positions]
+        discount = (gamma ** nb_steps)[:, np.newaxis] * (1. - terminal1)
+
+        first_positions = positions[:, 0]
+        return NStepBatch(
+            state0=self.codec.decode(self.state0[first_positions]),
+            action=self.action[first_positions],
+            reward=reward,
+            state1=self.codec.decode(self.state1[last_positions]),
+            terminal1=terminal1,
+            discount=discount)
+
     def append(self, experience):
-        self.buffer.append(experience)
+        if self.length > 0:
+            # A new episode begins when told so by the caller, or after a terminal state
+            last_position = (self.start + self.length - 1) % self.limit
+            if experience.episode_start or self.terminal1[last_position, 0]:
+                self.current_episode += 1
+
+        if self.length < self.limit:
+            position = (self.start + self.length) % self.limit
+            self.length += 1
+        else:
+            # No space, overwrite the oldest experience
+            position = self.start
+            self.start = (self.start + 1) % self.limit
+
+        # The assignments copy the data into the arrays
+        self.state0[position] = self.codec.encode(experience.state0)
+        self.action[position] = experience.action
+        self.reward[position] = experience.reward
+        self.terminal1[position] = experience.terminal1
+        self.state1[position] = self.codec.encode(experience.state1)
+        self.episode[position] = self.current_episode
+
+    def extend(self, batch, episode_start=None):
+        """
+        Add a batch of consecutive experiences to the memory, at once
+
+        :param batch: A :class:`Batch` of arrays
+        :param episode_start: Boolean array of shape `(nb_experiences,)`, whether each experience begins a new episode (see :class:`Experience`).
+            By default, the experiences only begin a new episode after a terminal one.
+        """
+        batch = Batch(*[np.asarray(column) for column in batch])
+        if episode_start is None:
+            episode_start = np.zeros(len(batch.state0), dtype=bool)
+        episode_start = np.asarray(episode_start, dtype=bool)
+        if len(batch.state0) > self.limit:
+            # Only the last experiences would be kept
+            batch = Batch(*[column[-self.limit:] for column in batch])
+            episode_start = episode_start[-self.limit:]
+        nb_experiences = len(batch.state0)
+        if nb_experiences == 0:
+            return
+        state0 = self.codec.encode(batch.state0.reshape((nb_experiences, -1)))
+        state1 = self.codec.encode(batch.state1.reshape((nb_experiences, -1)))
+        terminal1 = batch.terminal1.reshape(nb_experiences).astype(bool)
+
+        # Same episode boundaries as with `append`
+        new_episode = np.empty(nb_experiences, dtype=bool)
+        if self.length > 0:
+            last_position = (self.start + self.length - 1) % self.limit
+            new_episode[0] = episode_start[0] or self.terminal1[last_position, 0]
+        else:
+            new_episode[0] = False
+        new_episode[1:] = episode_start[1:] | terminal1[:-1]
+        episodes = self.current_episode + np.cumsum(new_episode)
+        self.current_episode = episodes[-1]
+
+        positions = (self.start + self.length + np.arange(nb_experiences)) % self.limit
+        length = min(self.limit, self.length + nb_experiences)
+        self.start = (self.start + self.length + nb_experiences - length) % self.limit
+        self.length = length
+
+        self.state0[positions] = state0
+        self.action[positions] = batch.action.reshape((nb_experiences, -1))
+        self.reward[positions, 0] = batch.reward.reshape(nb_experiences)
+        self.terminal1[positions, 0] = terminal1
+        self.state1[positions] = state1
+        self.episode[positions] = episodes
 
     @classmethod
-    def from_file(cls, env, limit, file_path):
-        """Create a memory from a pickle file"""
-        with open(file_path, "rb") as fd:
-            memory_database = pickle.load(fd)
+    def from_file(cls, env, limit, file_path, independent_transitions=False, **kwargs):
+        """
+        Create a memory from a pickle file
 
-        memory = cls(limit=limit, env=env)
+        The file holds a series of pickled objects, each being either a :class:`Batch` of arrays
+        or a list of experiences (as written by :meth:`save`).
 
-        for experience in memory_database:
-            memory.append(Experience(*experience))
+        :param bool independent_transitions: Whether each experience of the batches begins a new episode
+            (e.g. the transitions generated by :meth:`rl.agents.omniscient.OmniscientAgent.generate`).
+            Otherwise, the experiences of the batches only begin a new episode after a terminal one.
+        :param kwargs: Other parameters of the memory, e.g. `storage_dtype`
+        """
+        memory = cls(limit=limit, env=env, **kwargs)
+
+        with open(file_path, "rb") as fd:
+            while True:
+                try:
+                    memory_database = pickle.load(fd)
+                except EOFError:
+                    break
+                if isinstance(memory_database, Batch):
+                    if independent_transitions:
+                        memory.extend(memory_database, episode_start=np.ones(len(memory_database.state0), dtype=bool))
+                    else:
+                        memory.extend(memory_database)
+                else:
+                    for experience in memory_database:
+                        memory.append(Experience(*experience))
 
         return(memory)
 
@@ -104,11 +290,99 @@ class SimpleMemory(Memory):
         """Dump the memory into a pickle file"""
         print("Saving memory")
         with open(file, "wb") as fd:
-            pickle.dump(self.buffer.dump(), fd)
+            pickle.dump(self.dump(), fd)
 
     def dump(self):
-        """Get the memory content as a single array"""
-        return(self.buffer.dump())
+        """Get the memory content as a single array of :class:`Experience`"""
+        idxs = np.arange(self.length)
+        batch = self.get_idxs(idxs, batch_size=self.length)
+        episodes = self.episode[self._positions(idxs)]
+        episode_start = np.concatenate([[False], episodes[1:] != episodes[:-1]])
+        return([Experience(*experience) for experience in zip(batch.state0, batch.action, batch.reward[:, 0], batch.state1, batch.terminal1[:, 0], episode_start)])
 
     def __len__(self):
-        return(len(self.buffer))
+        return(self.length)
+
+    @property
+    def nbytes(self):
+        """Size of the arrays of the memory, in bytes"""
+        return(sum(array.nbytes for array in (self.state0, self.action, self.reward, self.terminal1, self.state1, self.episode)))
+
+
+class HindsightMemory(SimpleMemory):
+    """
+    A memory relabeling the goals of the experiences with goals achieved later in their episode,
+    as defined in https://arxiv.org/abs/1707.01495 (with the "future" strategy)
+
+    The states are flat vectors containing both the goal to reach and the goal achieved in this state,
+    e.g. the observations of a gym `GoalEnv` wrapped in a `FlattenDictWrapper`.
+    At sample time, a fraction of the batch gets the goal achieved after a random later step of its episode,
+    in both `state0` and `state1`, and its reward is recomputed for this goal.
+
+    :param achieved_goal: Slice (or indexes) of the achieved goal in the states
+    :param desired_goal: Slice (or indexes) of the desired goal in the states
+    :param float relabel_fraction: Fraction of each batch whose goals are relabeled
+    :param reward_function: Function `f(achieved_goals, desired_goals)` computing the rewards of a batch, as arrays of shape `(batch_size,)`.
+        Defaults to the `compute_reward` method of the environment.
+    :param kwargs: Other parameters of :class:`SimpleMemory`, e.g. `storage_dtype`
+    """
+    def __init__(self, env, limit, achieved_goal, desired_goal, relabel_fraction=0.8, reward_function=None, **kwargs):
+        super(HindsightMemory, self).__init__(env, limit, **kwargs)
+        self.achieved_goal = achieved_goal
+        self.desired_goal = desired_goal
+        self.relabel_fraction = relabel_fraction
+        if reward_function is None:
+            goal_env = getattr(env, "unwrapped", env)
+            reward_function = lambda achieved_goals, desired_goals: goal_env.compute_reward(achieved_goals, desired_goals, None)
+        self.reward_function = reward_function
+
+        # Number of experiences ever appended: the experience of global index `i` is at position `i % limit`
+        self.nb_appended = 0
+        # Global index of the last experience of each episode in the memory, at position `episode % limit`
+        self.episode_end = np.empty(limit, dtype=np.int64)
+
+    def append(self, experience):
+        super(HindsightMemory, self).append(experience)
+        self.episode_end[self.current_episode % self.limit] = self.nb_appended
+        self.nb_appended += 1
+
+    def extend(self, batch, episode_start=None):
+        if episode_start is None:
+            episode_start = np.zeros(len(batch.state0), dtype=bool)
+        for experience in zip(*(tuple(batch) + (episode_start, ))):
+            self.append(Experience(*experience))
+
+    def sample(self, batch_size, batch_idxs=None):
+        batch_idxs = self.sample_idxs(batch_size, batch_idxs)
+        batch = self.get_idxs(batch_idxs, batch_size=batch_size)
+
+        relabeled = np.flatnonzero(self.random_state.random(batch_size) < self.relabel_fraction)
+        if relabeled.size == 0:
+            return (batch)
+
+        # Draw a step between the experience and the end of its episode
+        first_index = self.nb_appended - self.length
+        indexes = first_index + batch_idxs[relabeled]
+        episode_ends = self.episode_end[self.episode[indexes % self.limit] % self.limit]
+        future_indexes = indexes + (self.random_state.random(relabeled.size) * (episode_ends - indexes + 1)).astype(np.int64)
+        goals = self.codec.decode(self.state1[future_indexes % self.limit])[:, self.achieved_goal]
+
+        # The gathered arrays are copies, they can be modified
+        cells = _goal_cells(relabeled, self.desired_goal)
+        batch.state0[cells] = goals
+        batch.state1[cells] = goals
+        rewards = self.reward_function(batch.state1[relabeled][:, self.achieved_goal], goals)
+        batch.reward[relabeled, 0] = rewards
+        return (batch)
+
+    def sample_nstep(self, batch_size, n_step, gamma, batch_idxs=None):
+        raise NotImplementedError("N-step transitions are not relabeled")
+
+
+def _goal_cells(rows, goal):
+    """Index of the goal (a slice, an index or an array of indexes) in the given rows of a batch of states"""
+    if isinstance(goal, slice) or np.ndim(goal) == 0:
+        return (rows, goal)
+    # Cross product of the rows and the columns, instead of pairing them
+    return (np.ix_(rows, np.asarray(goal)))
+
@@ -1,13 +1,21 @@
 from __future__ import division
 import numpy as np
 
-from rl.utils import get_object_config
+from rl.utils.model import get_object_config
+from rl.random import get_generator
 
 
 class Policy(object):
+    def __init__(self, seed=None):
+        self.random_state = get_generator(seed)
+
     def _set_agent(self, agent):
         self.agent = agent
 
+    def seed(self, seed=None):
+        """Replace the random generator of the policy (see :func:`rl.random.get_generator`)"""
+        self.random_state = get_generator(seed)
+
     @property
     def metrics_names(self):
         return []
@@ -19,6 +27,15 @@ class Policy(object):
     def select_action(self, **kwargs):
         raise NotImplementedError()
 
+    def select_actions(self, q_values):
+        """
+        Select the actions of a batch, e.g. of parallel environments
+
+        :param q_values: Array of shape `(batch_size, nb_actions)`
+        :return: The actions, of shape `(batch_size,)`
+        """
+        return np.array([self.select_action(q_values=row) for row in q_values])
+
     def get_config(self):
         return {}
 
@@ -37,20 +54,41 @@ class LinearAnnealedPolicy(Policy):
         self.value_test = value_test
         self.nb_steps = nb_steps
 
-    def get_current_value(self):
+    def get_current_value(self, steps=None):
+        """
+        :param steps: Array of steps (e.g. of parallel actors), to get one value per step. Defaults to the step of the agent.
+        """
         if self.agent.training:
             # Linear annealed: f(x) = ax + b.
             a = -float(self.value_max - self.value_min) / float(self.nb_steps)
             b = float(self.value_max)
-            value = max(self.value_min, a * float(self.agent.step) + b)
+            if steps is None:
+                value = max(self.value_min, a * float(self.agent.step) + b)
+            else:
+                value = np.maximum(self.value_min, a * np.asarray(steps, dtype=float) + b)
         else:
             value = self.value_test
         return value
 
+    def seed(self, seed=None):
+        self.inner_policy.seed(seed)
+
     def select_action(self, **kwargs):
         setattr(self.inner_policy, self.attr, self.get_current_value())
         return self.inner_policy.select_action(**kwargs)
 
+    def select_actions(self, q_values, steps=None):
+        """
+        :param steps: Array of shape `(batch_size,)` of the steps of the rows, each row getting its own annealed value.
+            The inner policy must then accept these values as a keyword argument named after `attr` (e.g. :meth:`EpsGreedyQPolicy.select_actions`).
+            Defaults to the step of the agent for all the rows.
+        """
+        # The attribute of the inner policy keeps the scalar value at the step of the agent
+        setattr(self.inner_policy, self.attr, self.get_current_value())
+        if steps is None:
+            return self.inner_policy.select_actions(q_values=q_values)
+        return self.inner_policy.select_actions(q_values=q_values, **{self.attr: self.get_current_value(steps)})
+
     @property
     def metrics_names(self):
         return ['mean_{}'.format(self.attr)]
@@ -71,20 +109,35 @@ class LinearAnnealedPolicy(Policy):
 
 
 class EpsGreedyQPolicy(Policy):
-    def __init__(self, eps=.1):
-        super(EpsGreedyQPolicy, self).__init__()
+    def __init__(self, eps=.1, seed=None):
+        super(EpsGreedyQPolicy, self).__init__(seed=seed)
         self.eps = eps
 
     def select_action(self, q_values):
         assert q_values.ndim == 1
         nb_actions = q_values.shape[0]
 
-        if np.random.uniform() < self.eps:
-            action = np.random.random_integers(0, nb_actions-1)
+        if self.random_state.random() < self.eps:
+            action = self.random_state.integers(nb_actions)
         else:
             action = np.argmax(q_values)
         return action
 
+    def select_actions(self, q_values, eps=None):
+        """
+        :param q_values: Array of shape `(batch_size, nb_actions)`
+        :param eps: Array of shape `(batch_size,)`, the epsilon of each row. Defaults to `self.eps` for all the rows.
+        """
+        assert q_values.ndim == 2
+        batch_size, nb_actions = q_values.shape
+        if eps is None:
+            eps = self.eps
+
+        actions = np.argmax(q_values, axis=1)
+        explore = (self.random_state.random(batch_size) < eps)
+        actions[explore] = self.random_state.integers(nb_actions, size=np.count_nonzero(explore))
+        return actions
+
     def get_config(self):
         config = super(EpsGreedyQPolicy, self).get_config()
         config['eps'] = self.eps
@@ -97,22 +150,37 @@ class GreedyQPolicy(Policy):
         action = np.argmax(q_values)
         return action
 
+    def select_actions(self, q_values):
+        assert q_values.ndim == 2
+        return np.argmax(q_values, axis=1)
+
 
 class BoltzmannQPolicy(Policy):
-    def __init__(self, tau=1., clip=(-500., 500.)):
-        super(BoltzmannQPolicy, self).__init__()
+    """
+    Sample the actions from the softmax of the Q values divided by the temperature `tau`
+
+    The actions are sampled with the Gumbel-max trick: the argmax of the scaled Q values plus Gumbel noise.
+    """
+    def __init__(self, tau=1., clip=(-500., 500.), seed=None):
+        super(BoltzmannQPolicy, self).__init__(seed=seed)
         self.tau = tau
         self.clip = clip
 
     def select_action(self, q_values):
         assert q_values.ndim == 1
-        q_values = q_values.astype('float64')
-        nb_actions = q_values.shape[0]
-
-        exp_values = np.exp(np.clip(q_values / self.tau, self.clip[0], self.clip[1]))
-        probs = exp_values / np.sum(exp_values)
-        action = np.random.choice(range(nb_actions), p=probs)
-        return action
+        return self.select_actions(q_values[np.newaxis])[0]
+
+    def select_actions(self, q_values, tau=None):
+        """
+        :param q_values: Array of shape `(batch_size, nb_actions)`
+        :param tau: Array of shape `(batch_size,)`, the temperature of each row. Defaults to `self.tau` for all the rows.
+        """
+        assert q_values.ndim == 2
+        if tau is None:
+            tau = self.tau
+        tau = np.reshape(tau, (-1, 1))
+        logits = np.clip(q_values.astype('float64') / tau, self.clip[0], self.clip[1])
+        return np.argmax(logits + self.random_state.gumbel(size=logits.shape), axis=1)
 
     def get_config(self):
         config = super(BoltzmannQPolicy, self).get_config()
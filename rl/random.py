@@ -1,17 +1,117 @@
 from __future__ import division
+import hashlib
 import numpy as np
 
+if hasattr(np.random, "SeedSequence"):
+    SeedSequence = np.random.SeedSequence
+    Generator = np.random.Generator
+
+    def _new_generator(seed_sequence):
+        return(np.random.default_rng(seed_sequence))
+else:
+    # numpy < 1.17 (e.g. on Python 2.7 and 3.4) has neither seed sequences nor generators
+
+    class SeedSequence(object):
+        """Fallback for :class:`numpy.random.SeedSequence`, whose children are identified by their path from the root"""
+        def __init__(self, entropy, spawn_key=()):
+            self.entropy = entropy
+            self.spawn_key = tuple(spawn_key)
+            self.n_children_spawned = 0
+
+        def spawn(self, n_children):
+            children = [SeedSequence(self.entropy, self.spawn_key + (i, ))
+                        for i in range(self.n_children_spawned, self.n_children_spawned + n_children)]
+            self.n_children_spawned += n_children
+            return(children)
+
+        def generate_state(self, n_words):
+            words = []
+            counter = 0
+            while len(words) < n_words:
+                digest = hashlib.sha256(repr((self.entropy, self.spawn_key, counter)).encode("ascii")).digest()
+                words.extend(np.frombuffer(digest, dtype=np.uint32))
+                counter += 1
+            return(np.array(words[:n_words], dtype=np.uint32))
+
+    class Generator(np.random.RandomState):
+        """Fallback for :class:`numpy.random.Generator`, with the methods used by the package"""
+        def integers(self, low, high=None, size=None):
+            return(self.randint(low, high, size=size))
+
+        def random(self, size=None):
+            return(self.random_sample(size))
+
+    def _new_generator(seed_sequence):
+        return(Generator(seed_sequence.generate_state(4)))
+
+
+def get_generator(seed=None):
+    """
+    Get a dedicated numpy random generator
+
+    :param seed: The seed of the generator. If already a :class:`numpy.random.Generator`, it is returned as is.
+        If None, the seed is drawn from the global numpy random state, so that `np.random.seed` still makes the runs reproducible.
+    :return: A :class:`numpy.random.Generator` (with numpy < 1.17, a :class:`numpy.random.RandomState` with the same methods)
+    """
+    if isinstance(seed, Generator):
+        return(seed)
+    return(_new_generator(get_seed_sequence(seed)))
+
+
+def get_seed_sequence(seed=None):
+    """
+    Get the root of a hierarchy of seeds
+
+    Independent child seeds are spawned from it with :meth:`numpy.random.SeedSequence.spawn`, e.g. for each experiment of a
+    :class:`rl.experiments.multiple.MultipleExperiments`, then for each agent of an experiment, and for each random component of an agent.
+
+    :param seed: An integer, or a :class:`numpy.random.SeedSequence` returned as is.
+        If None, the seed is drawn from the global numpy random state.
+    :return: A :class:`numpy.random.SeedSequence`
+    """
+    if isinstance(seed, SeedSequence):
+        return(seed)
+    if seed is None:
+        seed = np.random.randint(2**32, dtype=np.uint64)
+    return(SeedSequence(int(seed)))
+
+
+def spawn_seed(seed_sequence):
+    """Spawn the next child of a :class:`numpy.random.SeedSequence`"""
+    return(seed_sequence.spawn(1)[0])
+
 
 class RandomProcess(object):
-    def reset_states(self):
+    def reset_states(self, mask=None):
+        pass
+
+    def seed(self, seed=None):
+        """Replace the random generator of the process (see :func:`get_generator`)"""
         pass
 
 
 class AnnealedGaussianProcess(RandomProcess):
-    def __init__(self, mu, sigma, sigma_min, n_steps_annealing):
+    """
+    A process using gaussian noise, whose standard deviation is linearly annealed from `sigma` to `sigma_min` in `n_steps_annealing` steps.
+
+    The noise is generated by blocks of `block_size` steps, already scaled by the annealed standard deviation of each step.
+
+    :param int size: Dimension of the process
+    :param int nb_processes: Number of independent processes advanced together.
+        If None, the samples are of shape `(size,)`, otherwise of shape `(nb_processes, size)`.
+    :param seed: Seed of the dedicated random generator (see :func:`get_generator`)
+    :param int block_size: Number of steps whose noise is generated at once
+    """
+    def __init__(self, mu, sigma, sigma_min, n_steps_annealing, size=1, nb_processes=None, seed=None, block_size=1000):
         self.mu = mu
         self.sigma = sigma
         self.n_steps = 0
+        self.size = size
+        self.nb_processes = nb_processes
+        if nb_processes is None:
+            self.shape = (size, )
+        else:
+            self.shape = (nb_processes, size)
 
         if sigma_min is not None:
             self.m = -float(sigma - sigma_min) / float(n_steps_annealing)
@@ -22,11 +122,40 @@ class AnnealedGaussianProcess(RandomProcess):
             self.c = sigma
             self.sigma_min = sigma
 
+        self.random_state = get_generator(seed)
+        self.block_size = block_size
+        # Additional factor applied to the noise
+        self.noise_scale = 1.
+        self._block = None
+        self._block_index = block_size
+
+    def seed(self, seed=None):
+        self.random_state = get_generator(seed)
+        # Discard the noise generated with the previous generator
+        self._block_index = self.block_size
+
     @property
     def current_sigma(self):
         sigma = max(self.sigma_min, self.m * float(self.n_steps) + self.c)
         return sigma
 
+    def _generate_block(self):
+        steps = np.arange(self.n_steps, self.n_steps + self.block_size)
+        sigmas = self.noise_scale * np.maximum(self.sigma_min, self.m * steps + self.c)
+        # Broadcast the standard deviation of each step over the shape of the samples
+        sigmas = sigmas.reshape((self.block_size, ) + (1, ) * len(self.shape))
+        self._block = sigmas * self.random_state.standard_normal((self.block_size, ) + self.shape)
+        self._block_index = 0
+
+    def scaled_noise(self):
+        """Gaussian noise of the current step, with the annealed standard deviation, and advance the process by one step"""
+        if self._block_index >= self.block_size:
+            self._generate_block()
+        noise = self._block[self._block_index]
+        self._block_index += 1
+        self.n_steps += 1
+        return noise
+
 
 class GaussianWhiteNoiseProcess(AnnealedGaussianProcess):
     def __init__(self,
@@ -34,18 +163,18 @@ class GaussianWhiteNoiseProcess(AnnealedGaussianProcess):
                  sigma=1.,
                  sigma_min=None,
                  n_steps_annealing=1000,
-                 size=1):
+                 size=1,
+                 **kwargs):
         super(GaussianWhiteNoiseProcess, self).__init__(
             mu=mu,
             sigma=sigma,
             sigma_min=sigma_min,
-            n_steps_annealing=n_steps_annealing)
-        self.size = size
+            n_steps_annealing=n_steps_annealing,
+            size=size,
+            **kwargs)
 
     def sample(self):
-        sample = np.random.normal(self.mu, self.current_sigma, self.size)
-        self.n_steps += 1
-        return sample
+        return self.mu + self.scaled_noise()
 
 
 # Based on http://math.stackexchange.com/questions/1287634/implementing-ornstein-uhlenbeck-in-matlab
@@ -58,26 +187,68 @@ class OrnsteinUhlenbeckProcess(AnnealedGaussianProcess):
                  x0=None,
                  size=1,
                  sigma_min=None,
-                 n_steps_annealing=1000):
+                 n_steps_annealing=1000,
+                 **kwargs):
         super(OrnsteinUhlenbeckProcess, self).__init__(
             mu=mu,
             sigma=sigma,
             sigma_min=sigma_min,
-            n_steps_annealing=n_steps_annealing)
+            n_steps_annealing=n_steps_annealing,
+            size=size,
+            **kwargs)
         self.theta = theta
-        self.mu = mu
         self.dt = dt
         self.x0 = x0
-        self.size = size
+        self.noise_scale = np.sqrt(dt)
         self.reset_states()
 
     def sample(self):
-        x = self.x_prev + self.theta * (
-            self.mu - self.x_prev) * self.dt + self.current_sigma * np.sqrt(
-                self.dt) * np.random.normal(size=self.size)
+        x = self.x_prev + self.theta * self.dt * (self.mu - self.x_prev) + self.scaled_noise()
         self.x_prev = x
-        self.n_steps += 1
         return x
 
+    def reset_states(self, mask=None):
+        """
+        Reset the processes to `x0`
+
+        :param mask: Boolean array of shape `(nb_processes,)` selecting the processes to reset. If None, reset all of them.
+        """
+        x0 = np.broadcast_to(self.x0 if self.x0 is not None else 0., self.shape)
+        if mask is None:
+            self.x_prev = np.array(x0, dtype=float)
+        else:
+            self.x_prev[mask] = x0[mask]
+
+
+class AdaptiveParameterNoise(object):
+    """
+    Scale of a noise applied to the weights of a policy, adapted as described in https://arxiv.org/abs/1706.01905
+
+    The standard deviation of the weights perturbation is adapted so that the distance between the actions
+    of the perturbed and unperturbed policies stays close to `desired_action_stddev`.
+
+    :param float initial_stddev: Initial standard deviation of the weights perturbation
+    :param float desired_action_stddev: Desired distance between the perturbed and unperturbed actions
+    :param float adoption_coefficient: Factor by which the standard deviation is divided (or multiplied) at each adaptation
+    """
+    def __init__(self, initial_stddev=0.1, desired_action_stddev=0.1, adoption_coefficient=1.01):
+        self.initial_stddev = initial_stddev
+        self.desired_action_stddev = desired_action_stddev
+        self.adoption_coefficient = adoption_coefficient
+        self.current_stddev = initial_stddev
+
+    def adapt(self, distance):
+        """
+        Adapt the standard deviation
+
+        :param float distance: The distance between the perturbed and unperturbed actions, e.g. the RMS of their difference
+        """
+        if distance > self.desired_action_stddev:
+            # Decrease the perturbation
+            self.current_stddev /= self.adoption_coefficient
+        else:
+            # Increase the perturbation
+            self.current_stddev *= self.adoption_coefficient
+
     def reset_states(self):
-        self.x_prev = self.x0 if self.x0 is not None else np.zeros(self.size)
+        self.current_stddev = self.initial_stddev
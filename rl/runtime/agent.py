@@ -1,11 +1,17 @@
 from .experiment import DefaultExperiment
 from .runtime import runtime
 from rl.hooks.container import AgentHooksContainer
+from rl.random import get_generator, get_seed_sequence, spawn_seed
 
 
 class Agent(object):
-    """Abstract class for an agent"""
-    def __init__(self, experiment=None, hooks=None, name=None):
+    """
+    Abstract class for an agent
+
+    :param seed: Seed of the agent (see :func:`rl.random.get_seed_sequence`). Defaults to a child seed of the experiment.
+        The agent draws from its own generator, :attr:`random_state`, and spawns child seeds for its random components.
+    """
+    def __init__(self, experiment=None, hooks=None, name=None, seed=None):
         # Dict to store useful agent attributes
         self.attributes = {"default": True}
 
@@ -27,6 +33,12 @@ class Agent(object):
 
         self.experiment.add_agent(self)
 
+        if seed is None:
+            self.seed_sequence = self.experiment.spawn_seed()
+        else:
+            self.seed_sequence = get_seed_sequence(seed)
+        self.random_state = get_generator(self.seed_sequence)
+
         # Setup hook variables
         self._hook_variables = ["training", "step", "episode", "episode_step", "done", "step_summaries"]
         self._hook_variables_optional = ["reward", "episode_reward", "observation"]
@@ -62,6 +74,10 @@ class Agent(object):
 
         self.hooks = AgentHooksContainer(self, hooks_list)
 
+    def spawn_seed(self):
+        """Get a new child seed of the agent, e.g. for a random component or an environment"""
+        return(spawn_seed(self.seed_sequence))
+
     def _run(self, train=True):
         raise(NotImplementedError())
 
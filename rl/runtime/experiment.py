@@ -4,6 +4,7 @@ from rl.hooks import ExperimentHooksContainer
 # from contextlib import contextmanager
 from .run import Run
 from ..utils.printer import print_info, print_warning
+from ..random import get_seed_sequence, spawn_seed
 from .runtime import runtime
 
 
@@ -45,9 +46,17 @@ class PersistentExperiment(object):
 
 
 class Experiment(PersistentExperiment):
-    def __init__(self, experiment_id, experiments=None, hooks=None, use_tf=True, tf_config=None, analytics=False, **kwargs):
+    """
+    An experiment, running agents
+
+    :param seed: Root seed of the experiment (see :func:`rl.random.get_seed_sequence`).
+        Each agent gets a child seed, from which its own random components are seeded, so that a run can be replayed.
+    """
+    def __init__(self, experiment_id, experiments=None, hooks=None, use_tf=True, tf_config=None, analytics=False, seed=None, **kwargs):
         super(Experiment, self).__init__(experiment_id, **kwargs)
 
+        self.seed_sequence = get_seed_sequence(seed)
+
         self.count = 1
         self.done = False
         self.experiments = experiments
@@ -85,6 +94,9 @@ class Experiment(PersistentExperiment):
             # self.session = K.get_session()
             self.session = tf.Session(config=tf_config)
             K.set_session(self.session)
+            # Graph-level seed, from which the seeds of the random ops are derived
+            with self.session.graph.as_default():
+                tf.set_random_seed(int(self.seed_sequence.generate_state(1)[0] % 2**31))
 
     def __enter__(self):
         print_info("Beginning experiment {}".format(self.id))
@@ -101,6 +113,10 @@ class Experiment(PersistentExperiment):
     def get_new_agent_id(self):
         return (self.next_agent_id)
 
+    def spawn_seed(self):
+        """Get a new child seed, independent of the ones already spawned"""
+        return (spawn_seed(self.seed_sequence))
+
     def add_agent(self, agent):
         """Add the agent to the experiment registers, and return its id"""
         if agent.name in self.agents:
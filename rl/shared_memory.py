@@ -0,0 +1,245 @@
+from __future__ import absolute_import
+import multiprocessing
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8
+    shared_memory = None
+
+import numpy as np
+
+from rl.memory import Memory, Batch
+from rl.utils.memory import sample_batch_indexes, ObservationCodec
+
+# Alignment of the columns in the segments, a cache line
+_ALIGNMENT = 64
+
+
+class SharedMemory(Memory):
+    """
+    A memory shared between processes, e.g. several actors writing experiences and a learner sampling them (Python >= 3.8)
+
+    The memory is split in `nb_shards` shards, one per writer process, each being a circular buffer in its own
+    :class:`multiprocessing.shared_memory.SharedMemory` segment, with the columns of :class:`rl.memory.SimpleMemory`.
+    Each shard has a single writer, which appends to it and then advances its write cursor (the number of experiences ever written).
+    The samples are gathered directly from the segments by the learner, without going through pipes.
+
+    By default, no lock is taken: the learner skips the `margin` oldest experiences of each full shard,
+    which are the next ones to be overwritten, and checks the cursors after gathering a batch,
+    drawing again the (rare) experiences that were overwritten meanwhile.
+    This relies on the writes of the data and of the cursor being seen in order, as on x86.
+    With `locks=True`, a lock per shard is taken by its writer and by the learner while it gathers from this shard.
+
+    The memory is pickled to be sent to the other processes, which attach to the same segments.
+    Each writer selects its shard with :meth:`select_shard`.
+    The process creating the memory must call :meth:`unlink` once done, the others :meth:`close`.
+
+    :param int limit: Total number of experiences, split between the shards
+    :param int nb_shards: Number of shards, i.e. of writers
+    :param str storage_dtype: Storage dtype of the observations (see :class:`rl.utils.memory.ObservationCodec`)
+    :param bool locks: Use a lock per shard
+    :param int margin: Number of experiences skipped at the end of each full shard, when not using locks
+    :param seed: Seed of the random generator of the memory
+    :param str start_method: Start method of the writer processes (see :mod:`multiprocessing`), for the locks
+    """
+    copies_observations = True
+
+    def __init__(self, env, limit, nb_shards=1, storage_dtype="float32", locks=False, margin=64, seed=None, start_method=None):
+        if shared_memory is None:
+            raise (ImportError("SharedMemory requires multiprocessing.shared_memory, available from Python 3.8"))
+        super(SharedMemory, self).__init__(env, seed=seed)
+        self.nb_shards = nb_shards
+        self.shard_limit = -(-limit // nb_shards)
+        self.limit = self.shard_limit * nb_shards
+        self.codec = ObservationCodec(storage_dtype,
+                                      low=getattr(env.observation_space, "low", None),
+                                      high=getattr(env.observation_space, "high", None))
+        float_dtype = np.float64 if storage_dtype == "float64" else np.float32
+        if locks:
+            context = multiprocessing.get_context(start_method)
+            self.locks = [context.Lock() for _ in range(nb_shards)]
+            self.margin = 0
+        else:
+            self.locks = None
+            self.margin = min(margin, self.shard_limit // 2)
+
+        # Layout of a segment: the cursor, then the columns
+        self.columns_specs = [
+            ("state0", self.codec.dtype, (self.shard_limit, env.observation_space.dim)),
+            ("action", float_dtype, (self.shard_limit, env.action_space.dim)),
+            ("reward", float_dtype, (self.shard_limit, 1)),
+            ("terminal1", bool, (self.shard_limit, 1)),
+            ("state1", self.codec.dtype, (self.shard_limit, env.observation_space.dim)),
+        ]
+        size = _ALIGNMENT
+        for name, dtype, shape in self.columns_specs:
+            size += _aligned(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+        self.segments = [shared_memory.SharedMemory(create=True, size=size) for _ in range(nb_shards)]
+        self.owner = True
+        # Shard written by this process
+        self.shard = 0
+        self._attach()
+        for cursor in self.cursors:
+            cursor[0] = 0
+
+    def _attach(self):
+        """Create the views of the segments"""
+        self.cursors = []
+        self.columns = {name: [] for name, _, _ in self.columns_specs}
+        for segment in self.segments:
+            self.cursors.append(np.ndarray((1, ), dtype=np.int64, buffer=segment.buf))
+            offset = _ALIGNMENT
+            for name, dtype, shape in self.columns_specs:
+                self.columns[name].append(np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=offset))
+                offset += _aligned(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        self.select_shard(self.shard)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The environment may hold unpicklable objects (e.g. placeholders), and is not needed to read or write
+        state["env"] = None
+        state["segments"] = [segment.name for segment in self.segments]
+        del state["cursors"]
+        del state["columns"]
+        del state["shard_columns"]
+        return (state)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.segments = [shared_memory.SharedMemory(name=name) for name in self.segments]
+        self.owner = False
+        self._attach()
+
+    def select_shard(self, shard):
+        """Select the shard written by this process"""
+        if not 0 <= shard < self.nb_shards:
+            raise IndexError("Invalid shard {}, for a memory of {} shards".format(shard, self.nb_shards))
+        self.shard = shard
+        self.shard_columns = [self.columns[name][shard] for name, _, _ in self.columns_specs]
+
+    def append(self, experience):
+        if self.locks is not None:
+            self.locks[self.shard].acquire()
+        try:
+            cursor = self.cursors[self.shard]
+            count = int(cursor[0])
+            position = count % self.shard_limit
+            state0, action, reward, terminal1, state1 = self.shard_columns
+            state0[position] = self.codec.encode(experience.state0)
+            action[position] = experience.action
+            reward[position] = experience.reward
+            terminal1[position] = experience.terminal1
+            state1[position] = self.codec.encode(experience.state1)
+            # Publish the experience
+            cursor[0] = count + 1
+        finally:
+            if self.locks is not None:
+                self.locks[self.shard].release()
+
+    def extend(self, batch):
+        """
+        Add a batch of consecutive experiences to the shard of this process
+
+        :param batch: A :class:`rl.memory.Batch` of arrays
+        """
+        batch = Batch(*[np.asarray(column) for column in batch])
+        nb_experiences = len(batch.state0)
+        if nb_experiences > self.shard_limit:
+            # Only the last experiences would be kept
+            batch = Batch(*[column[-self.shard_limit:] for column in batch])
+        nb_written = len(batch.state0)
+        if nb_written == 0:
+            return
+
+        if self.locks is not None:
+            self.locks[self.shard].acquire()
+        try:
+            cursor = self.cursors[self.shard]
+            first = int(cursor[0]) + nb_experiences - nb_written
+            positions = (first + np.arange(nb_written)) % self.shard_limit
+            self.columns["state0"][self.shard][positions] = self.codec.encode(batch.state0.reshape((nb_written, -1)))
+            self.columns["action"][self.shard][positions] = batch.action.reshape((nb_written, -1))
+            self.columns["reward"][self.shard][positions, 0] = batch.reward.reshape(nb_written)
+            self.columns["terminal1"][self.shard][positions, 0] = batch.terminal1.reshape(nb_written)
+            self.columns["state1"][self.shard][positions] = self.codec.encode(batch.state1.reshape((nb_written, -1)))
+            # Publish the experiences
+            cursor[0] = first + nb_written
+        finally:
+            if self.locks is not None:
+                self.locks[self.shard].release()
+
+    def _cursors(self):
+        return (np.array([cursor[0] for cursor in self.cursors], dtype=np.int64))
+
+    def _draw(self, size, cursors):
+        """Draw experiences, as their shards and their global indexes in the shards (the number of experiences written before them)"""
+        firsts = np.maximum(cursors - self.shard_limit + self.margin, 0)
+        lengths = cursors - firsts
+        ends = np.cumsum(lengths)
+        if ends[-1] < size:
+            raise (IndexError("Not enough elements in the memory (currently {}) to sample a batch of size {}".format(ends[-1], size)))
+        idxs = sample_batch_indexes(0, ends[-1], size=size, random_state=self.random_state)
+        shards = np.searchsorted(ends, idxs, side="right")
+        return (shards, firsts[shards] + idxs - (ends - lengths)[shards])
+
+    def _gather(self, arrays, rows, shards, indexes):
+        for shard in np.unique(shards):
+            mask = (shards == shard)
+            positions = indexes[mask] % self.shard_limit
+            if self.locks is not None:
+                self.locks[shard].acquire()
+            try:
+                for name in arrays:
+                    arrays[name][rows[mask]] = self.columns[name][shard][positions]
+            finally:
+                if self.locks is not None:
+                    self.locks[shard].release()
+
+    def sample(self, batch_size):
+        arrays = {name: np.empty((batch_size, ) + shape[1:], dtype=dtype) for name, dtype, shape in self.columns_specs}
+        rows = np.arange(batch_size)
+        cursors = self._cursors()
+        while rows.size > 0:
+            shards, indexes = self._draw(rows.size, cursors)
+            self._gather(arrays, rows, shards, indexes)
+            if self.locks is not None:
+                break
+            # An experience may have been overwritten if its writer reached the next one at the same position
+            cursors = self._cursors()
+            overwritten = (indexes + self.shard_limit <= cursors[shards])
+            rows = rows[overwritten]
+
+        return (Batch(
+            state0=self.codec.decode(arrays["state0"]),
+            action=arrays["action"],
+            reward=arrays["reward"],
+            state1=self.codec.decode(arrays["state1"]),
+            terminal1=arrays["terminal1"]))
+
+    def __len__(self):
+        return (int(np.sum(np.minimum(self._cursors(), self.shard_limit))))
+
+    @property
+    def nbytes(self):
+        """Size of the segments, in bytes"""
+        return (sum(segment.size for segment in self.segments))
+
+    def close(self):
+        """Detach this process from the segments"""
+        self.cursors = []
+        self.columns = {}
+        self.shard_columns = []
+        for segment in self.segments:
+            segment.close()
+
+    def unlink(self):
+        """Detach from the segments and free them. Only called by the process which created the memory."""
+        self.close()
+        if self.owner:
+            for segment in self.segments:
+                segment.unlink()
+
+
+def _aligned(size):
+    return (-(-size // _ALIGNMENT) * _ALIGNMENT)
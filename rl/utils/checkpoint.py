@@ -0,0 +1,273 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Atomic on POSIX, and also overwrites on Windows with Python 3
+_replace = getattr(os, "replace", os.rename)
+
+
+def flatten_weights(weights):
+    """Convert a dictionary of lists of arrays (e.g. `{"actor": [...], "critic": [...]}`) into a flat dictionary of arrays"""
+    return ({"{}/{}".format(name, idx): array for name, arrays in weights.items() for idx, array in enumerate(arrays)})
+
+
+def unflatten_weights(arrays):
+    """Inverse of :func:`flatten_weights`"""
+    weights = {}
+    for key in arrays:
+        name, idx = key.rsplit("/", 1)
+        weights.setdefault(name, {})[int(idx)] = arrays[key]
+    return ({name: [items[idx] for idx in sorted(items)] for name, items in weights.items()})
+
+
+def load_checkpoint(path):
+    """
+    Load a checkpoint written by :class:`CheckpointManager`
+
+    :param str path: Path of the checkpoint, without extension
+    :return: The weights (a dictionary of lists of arrays) and the metadata
+    """
+    with np.load(path + ".npz") as arrays:
+        weights = unflatten_weights({key: arrays[key] for key in arrays.files})
+    with open(path + ".json") as fd:
+        metadata = json.load(fd)
+    return (weights, metadata)
+
+
+class CheckpointManager(object):
+    """
+    Write checkpoints of weights in a background thread
+
+    :meth:`save` only enqueues weights that were already copied in memory (e.g. by `get_weights`), so the training is not stalled by the disk.
+    The thread is stopped by :meth:`close`, and can be started again with :meth:`start`.
+    Each checkpoint is written as a `.npz` file of the weights and a `.json` file of metadata (step, episode...),
+    with an atomic rename, so that a checkpoint on disk is always complete.
+    Only the last `max_to_keep` checkpoints are kept.
+
+    :param str directory: Directory of the checkpoints
+    :param int max_to_keep: Number of checkpoints kept. If None, keep all of them.
+    :param str prefix: Prefix of the file names
+    :param int max_pending: Maximal number of checkpoints waiting to be written. When reached, :meth:`save` blocks.
+    """
+    def __init__(self, directory, max_to_keep=5, prefix="checkpoint", max_pending=2):
+        self.directory = directory
+        self.max_to_keep = max_to_keep
+        self.prefix = prefix
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # Paths of the checkpoints on disk, oldest first
+        self.checkpoints = []
+        self.error = None
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.start()
+
+    def start(self):
+        """Start the background thread, if not running"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._work, name="CheckpointManager")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def save(self, weights, step, **metadata):
+        """
+        Enqueue a checkpoint
+
+        :param weights: A dictionary of lists of arrays, which must not be modified afterwards
+        :param int step: The step of the checkpoint, used in the file name
+        :param metadata: Other JSON-serializable information, e.g. the episode
+        """
+        if self.error is not None:
+            raise (self.error)
+        if not self.thread.is_alive():
+            raise (RuntimeError("The checkpoint manager is closed"))
+        metadata["step"] = step
+        self.queue.put((weights, metadata))
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _write(self, weights, metadata):
+        path = os.path.join(self.directory, "{}-{}".format(self.prefix, metadata["step"]))
+
+        # Write in temporary files, then rename them
+        with open(path + ".npz.tmp", "wb") as fd:
+            np.savez(fd, **flatten_weights(weights))
+        with open(path + ".json.tmp", "w") as fd:
+            json.dump(metadata, fd)
+        _replace(path + ".npz.tmp", path + ".npz")
+        _replace(path + ".json.tmp", path + ".json")
+
+        if path in self.checkpoints:
+            self.checkpoints.remove(path)
+        self.checkpoints.append(path)
+        if self.max_to_keep is not None:
+            while len(self.checkpoints) > self.max_to_keep:
+                old_path = self.checkpoints.pop(0)
+                for extension in (".npz", ".json"):
+                    if os.path.exists(old_path + extension):
+                        os.remove(old_path + extension)
+
+    @property
+    def latest(self):
+        """Path of the last checkpoint written, or None"""
+        if len(self.checkpoints) == 0:
+            return (None)
+        return (self.checkpoints[-1])
+
+    def wait(self):
+        """Wait until all the enqueued checkpoints are written"""
+        self.queue.join()
+        if self.error is not None:
+            raise (self.error)
+
+    def close(self):
+        """Write the enqueued checkpoints and stop the background thread"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise (self.error)
+
+
+class CheckpointStore(object):
+    """
+    A store of named checkpoints of weights, kept in memory within a budget
+
+    When the weights in memory exceed `memory_budget` bytes, the least recently used checkpoints are spilled to disk,
+    and then read through memory-mapped arrays.
+
+    :param int memory_budget: Maximal number of bytes of weights kept in memory. If None, nothing is spilled to disk.
+    :param str directory: Directory of the spilled checkpoints. Defaults to a new temporary directory, removed by :meth:`close`.
+    """
+    def __init__(self, memory_budget=None, directory=None):
+        self.memory_budget = memory_budget
+        self._directory = directory
+        self._temporary_directory = False
+        # name -> {"weights": ..., "tags": ..., "spilled": ...}, least recently used first
+        self.entries = OrderedDict()
+        # Names of the checkpoints, in the order they were stored
+        self.history = []
+        # Number of checkpoints ever stored
+        self.nb_created = 0
+        self.memory_usage = 0
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="checkpoints-")
+            self._temporary_directory = True
+        return (self._directory)
+
+    @property
+    def names(self):
+        """Names of the checkpoints, least recently used first"""
+        return (list(self.entries.keys()))
+
+    def tagged(self, tag):
+        """Names of the checkpoints with the given tag"""
+        return ([name for name, entry in self.entries.items() if tag in entry["tags"]])
+
+    def __contains__(self, name):
+        return (name in self.entries)
+
+    def __len__(self):
+        return (len(self.entries))
+
+    def put(self, name, weights, tags=()):
+        """
+        Store a checkpoint, replacing any checkpoint of the same name
+
+        :param str name: Name of the checkpoint
+        :param weights: A dictionary of lists of arrays, which must not be modified afterwards
+        :param tags: Tags of the checkpoint
+        """
+        if name in self.entries:
+            self.remove(name)
+        self.entries[name] = {"weights": weights, "tags": set(tags), "spilled": False}
+        self.history.append(name)
+        self.nb_created += 1
+        self.memory_usage += _nbytes(weights)
+        self._enforce_budget()
+
+    def get(self, name):
+        """Get the weights of a checkpoint (memory-mapped if spilled to disk)"""
+        entry = self.entries.pop(name)
+        # Mark as most recently used
+        self.entries[name] = entry
+        return (entry["weights"])
+
+    def remove(self, name):
+        entry = self.entries.pop(name)
+        self.history.remove(name)
+        if entry["spilled"]:
+            shutil.rmtree(self._path(name))
+        else:
+            self.memory_usage -= _nbytes(entry["weights"])
+
+    def _path(self, name):
+        return (os.path.join(self.directory, name))
+
+    def _enforce_budget(self):
+        if self.memory_budget is None:
+            return
+        for name, entry in list(self.entries.items()):
+            if self.memory_usage <= self.memory_budget:
+                break
+            if not entry["spilled"]:
+                self._spill(name, entry)
+
+    def _spill(self, name, entry):
+        path = self._path(name)
+        os.makedirs(path)
+        weights = {}
+        for key, arrays in entry["weights"].items():
+            weights[key] = []
+            for idx, array in enumerate(arrays):
+                file_path = os.path.join(path, "{}-{}.npy".format(key, idx))
+                np.save(file_path, array)
+                weights[key].append(np.load(file_path, mmap_mode="r"))
+        self.memory_usage -= _nbytes(entry["weights"])
+        entry["weights"] = weights
+        entry["spilled"] = True
+
+    def clear(self):
+        for name in self.names:
+            self.remove(name)
+
+    def close(self):
+        """Remove all the checkpoints, and the temporary directory of the spilled ones"""
+        self.clear()
+        if self._temporary_directory:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+            self._temporary_directory = False
+
+    def __del__(self):
+        self.close()
+
+
+def _nbytes(weights):
+    return (sum(array.nbytes for arrays in weights.values() for array in arrays))
+
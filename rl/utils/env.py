@@ -26,3 +26,26 @@ def populate_env(env):
     env.state = keras.layers.Input(shape=(env.observation_space.dim,), name="state")
     env.action = keras.layers.Input(shape=(env.action_space.dim,), name="action")
     return(env)
+
+
+def mutates_observations(env, nb_steps=100):
+    """
+    Check whether the environment modifies in place the observations it previously returned (e.g. by reusing the same array).
+    The environment is reset, and stepped with random actions.
+
+    Such environments must be run with `copy_observations=True` (see :func:`rl.agents.rlagent.RLAgent._run`).
+
+    :param int nb_steps: Number of steps to check
+    :return: True if an observation was modified by a later call to `step` or `reset`
+    """
+    observation = env.reset()
+    snapshot = np.array(observation, copy=True)
+    for _ in range(nb_steps):
+        next_observation, _, done, _ = env.step(env.action_space.sample())
+        if done:
+            next_observation = env.reset()
+        if next_observation is observation or not np.array_equal(observation, snapshot):
+            return(True)
+        observation = next_observation
+        snapshot = np.array(observation, copy=True)
+    return(False)
@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import tensorflow as tf
+import keras.backend as K
+
+from rl.utils.inference import NumpyActor
+
+
+def freeze_model(model, session=None):
+    """
+    Freeze a Keras model with a single input and output into a standalone graph
+
+    The variables are replaced by constants holding their current values,
+    and the learning phase by a constant `False` (inference mode).
+    Only the ops needed to compute the output are kept.
+
+    :param session: Session holding the values of the variables. Defaults to the Keras session.
+    :return: The `GraphDef`, and the names of the input and output tensors
+    """
+    if session is None:
+        session = K.get_session()
+    input_tensor = model.inputs[0]
+    output_tensor = model.outputs[0]
+
+    graph_def = tf.graph_util.convert_variables_to_constants(
+        session, session.graph.as_graph_def(), [output_tensor.op.name])
+
+    learning_phase = K.learning_phase()
+    if hasattr(learning_phase, "op"):
+        for node in graph_def.node:
+            if node.name == learning_phase.op.name:
+                node.op = "Const"
+                del node.input[:]
+                node.attr.clear()
+                node.attr["dtype"].type = tf.bool.as_datatype_enum
+                node.attr["value"].tensor.CopyFrom(tf.make_tensor_proto(False, dtype=tf.bool))
+    return (graph_def, input_tensor.name, output_tensor.name)
+
+
+def export_actor(actor, path, session=None):
+    """
+    Export an actor (e.g. :attr:`rl.agents.ddpg.DDPGAgent.actor`) as a frozen graph, loaded by :class:`FrozenActor`
+
+    Two files are written: `path.pb`, the serialized graph, and `path.json`, the names of its input and output.
+
+    :param session: Session holding the weights of the actor (e.g. `agent.session`). Defaults to the Keras session.
+    """
+    graph_def, input_name, output_name = freeze_model(actor, session=session)
+    with open(path + ".pb", "wb") as fd:
+        fd.write(graph_def.SerializeToString())
+    with open(path + ".json", "w") as fd:
+        json.dump({"input": input_name, "output": output_name}, fd)
+
+
+class FrozenActor(object):
+    """
+    An actor exported by :func:`export_actor`, run in its own graph and session, without Keras
+
+    :param str path: Path of the exported actor, without extension
+    :param config: Configuration of the session (a `tf.ConfigProto`)
+    """
+    def __init__(self, path, config=None):
+        with open(path + ".json") as fd:
+            names = json.load(fd)
+        graph_def = tf.GraphDef()
+        with open(path + ".pb", "rb") as fd:
+            graph_def.ParseFromString(fd.read())
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name="")
+        self.input = self.graph.get_tensor_by_name(names["input"])
+        self.output = self.graph.get_tensor_by_name(names["output"])
+        self.session = tf.Session(graph=self.graph, config=config)
+
+    def predict(self, states):
+        """
+        Compute the actions
+
+        :param states: A state of shape `(state_dim,)`, or a batch of shape `(batch_size, state_dim)`
+        :return: The action, or the batch of actions
+        """
+        states = np.asarray(states)
+        if states.ndim == 1:
+            return (self.session.run(self.output, feed_dict={self.input: states[np.newaxis]})[0])
+        return (self.session.run(self.output, feed_dict={self.input: states}))
+
+    def close(self):
+        self.session.close()
+
+
+def numpy_actor(model):
+    """
+    Convert a Keras multilayer perceptron (a chain of `Dense` and `Activation` layers, as :func:`rl.utils.networks.simple_actor`)
+    into a :class:`rl.utils.inference.NumpyActor`, with the current weights
+
+    :raises ValueError: If the model has other layers
+    """
+    layers = []
+    for layer in model.layers:
+        layer_type = type(layer).__name__
+        if layer_type == "InputLayer":
+            continue
+        elif layer_type == "Dense":
+            weights = layer.get_weights()
+            bias = weights[1] if len(weights) > 1 else None
+            layers.append((weights[0], bias, layer.get_config()["activation"]))
+        elif layer_type == "Activation":
+            layers.append((None, None, layer.get_config()["activation"]))
+        else:
+            raise ValueError("Layer {} of type {} is not supported by the NumPy actor".format(layer.name, layer_type))
+    return (NumpyActor(layers))
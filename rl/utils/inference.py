@@ -0,0 +1,74 @@
+import numpy as np
+
+#: Activations supported by :class:`NumpyActor`, by their Keras names
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0., out=x),
+    "tanh": lambda x: np.tanh(x, out=x),
+    "sigmoid": lambda x: 1. / (1. + np.exp(-x)),
+    "softplus": lambda x: np.logaddexp(0., x),
+}
+
+
+class NumpyActor(object):
+    """
+    A multilayer perceptron actor evaluated with NumPy only, e.g. exported from a Keras actor by :func:`rl.utils.export.numpy_actor`
+
+    For the small actors of control tasks, this avoids the overhead of a Tensorflow session run at each step.
+
+    :param layers: List of `(kernel, bias, activation)`. `kernel` and `bias` can be None, e.g. for an activation layer.
+    :param dtype: Dtype of the computations
+    """
+    def __init__(self, layers, dtype=np.float32):
+        self.dtype = dtype
+        self.layers = []
+        for kernel, bias, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError("Unsupported activation {}, use one of {}".format(activation, sorted(ACTIVATIONS)))
+            self.layers.append((None if kernel is None else np.asarray(kernel, dtype=dtype),
+                                None if bias is None else np.asarray(bias, dtype=dtype),
+                                activation))
+
+    def predict(self, states):
+        """
+        Compute the actions
+
+        :param states: A state of shape `(state_dim,)`, or a batch of shape `(batch_size, state_dim)`
+        :return: The action, or the batch of actions
+        """
+        x = np.asarray(states, dtype=self.dtype)
+        single = (x.ndim == 1)
+        if single:
+            x = x[np.newaxis]
+        for kernel, bias, activation in self.layers:
+            if kernel is not None:
+                x = np.dot(x, kernel)
+            else:
+                # The bias and the activations are applied in place
+                x = x.copy()
+            if bias is not None:
+                x += bias
+            x = ACTIVATIONS[activation](x)
+        if single:
+            return (x[0])
+        return (x)
+
+    def save(self, path):
+        """Save the actor to a `.npz` file, loaded by :meth:`load`"""
+        arrays = {"activations": np.array([activation for _, _, activation in self.layers])}
+        for idx, (kernel, bias, _) in enumerate(self.layers):
+            if kernel is not None:
+                arrays["kernel_{}".format(idx)] = kernel
+            if bias is not None:
+                arrays["bias_{}".format(idx)] = bias
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, dtype=np.float32):
+        with np.load(path) as arrays:
+            layers = []
+            for idx, activation in enumerate(arrays["activations"]):
+                kernel = arrays["kernel_{}".format(idx)] if "kernel_{}".format(idx) in arrays.files else None
+                bias = arrays["bias_{}".format(idx)] if "bias_{}".format(idx) in arrays.files else None
+                layers.append((kernel, bias, str(activation)))
+        return (cls(layers, dtype=dtype))
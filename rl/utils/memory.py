@@ -3,7 +3,20 @@ import numpy as np
 import random
 
 
-def sample_batch_indexes(low, high, size):
+def sample_batch_indexes(low, high, size, random_state=None):
+    """
+    Draw `size` indexes in `[low, high)`, without replacement if possible
+
+    :param random_state: A :class:`numpy.random.Generator`. If None, the global random states of `random` and `numpy` are used.
+    """
+    if random_state is not None:
+        if high - low >= size:
+            # Generator.choice draws without replacement in O(size) when the range is large
+            return (low + random_state.choice(high - low, size=size, replace=False))
+        warnings.warn(
+            'Not enough entries to sample without replacement. Consider increasing your warm-up phase to avoid oversampling!'
+        )
+        return (random_state.integers(low, high, size=size))
     if high - low >= size:
         # We have enough data. Draw without replacement, that is each index is unique in the
         # batch. We cannot use `np.random.choice` here because it is horribly inefficient as
@@ -68,3 +81,94 @@ class RingBuffer(object):
     def dump(self):
         """Get all of the data in a single array"""
         return(self.data[:self.length])
+
+
+class ArrayRingBuffer(RingBuffer):
+    """
+    A ring buffer storing its values in a numpy array, so that they can be gathered at once (see :meth:`take`)
+
+    The array is allocated at the first append, with the shape of the values.
+    Values which can't be converted to a regular array (e.g. tuples of arrays of different shapes) are stored as objects.
+
+    :param dtype: The dtype of the array. Defaults to the dtype of the first value.
+    """
+    def __init__(self, maxlen, dtype=None):
+        self.maxlen = maxlen
+        self.start = 0
+        self.length = 0
+        self.dtype = dtype
+        self.data = None
+
+    def append(self, v):
+        if self.data is None:
+            try:
+                value = np.asarray(v, dtype=self.dtype)
+            except ValueError:
+                value = None
+            if value is None or value.dtype == object:
+                self.data = np.empty(self.maxlen, dtype=object)
+            else:
+                self.data = np.empty((self.maxlen, ) + value.shape, dtype=value.dtype)
+        super(ArrayRingBuffer, self).append(v)
+
+    def take(self, idxs):
+        """
+        Get the values of an array of indexes
+
+        :return: An array of shape `idxs.shape + value_shape`
+        """
+        idxs = np.asarray(idxs)
+        if idxs.size > 0 and (idxs.min() < 0 or idxs.max() >= self.length):
+            raise KeyError("Invalid indexes {}, for a buffer of length {}".format(idxs, self.length))
+        return (self.data[(self.start + idxs) % self.maxlen])
+
+    def dump(self):
+        if self.data is None:
+            return ([])
+        return (super(ArrayRingBuffer, self).dump())
+
+
+class ObservationCodec(object):
+    """
+    Storage format of the observations of a memory
+
+    The observations are encoded when stored, and decoded when gathered in a batch.
+
+    :param str dtype: One of:
+
+        * `"float64"`: Stored as is
+        * `"float32"`: Half the size of float64, with no loss for most environments
+        * `"float16"`: Decoded to float32. About 3 significant digits.
+        * `"uint8"`: Quantized on 256 levels between `low` and `high` (per dimension), and decoded to float32
+    :param low: Lower bounds of the observations, e.g. `observation_space.low` (required for `"uint8"`)
+    :param high: Upper bounds of the observations, e.g. `observation_space.high` (required for `"uint8"`)
+    """
+    dtypes = ("float64", "float32", "float16", "uint8")
+
+    def __init__(self, dtype="float32", low=None, high=None):
+        if dtype not in self.dtypes:
+            raise ValueError("Unknown storage dtype {}, use one of {}".format(dtype, self.dtypes))
+        self.dtype = np.dtype(dtype)
+
+        if self.dtype == np.uint8:
+            if low is None or high is None or not (np.isfinite(low).all() and np.isfinite(high).all()):
+                raise ValueError("Quantized observations need finite bounds, e.g. the observation space clipped by `populate_env`")
+            self.offset = np.asarray(low, dtype=np.float32)
+            span = np.asarray(high, dtype=np.float32) - self.offset
+            # Constant dimensions are stored as 0
+            self.scale = np.where(span > 0, span / 255., 1.).astype(np.float32)
+
+    def encode(self, observations):
+        """Convert observations to the storage dtype (out of bounds values are clipped when quantized)"""
+        if self.dtype != np.uint8:
+            return (np.asarray(observations, dtype=self.dtype))
+        levels = np.rint((np.asarray(observations, dtype=np.float32) - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255).astype(np.uint8))
+
+    def decode(self, stored):
+        """Convert stored observations (e.g. gathered from the memory arrays) to floats"""
+        if self.dtype == np.uint8:
+            return (stored * self.scale + self.offset)
+        if self.dtype == np.float16:
+            return (stored.astype(np.float32))
+        return (stored)
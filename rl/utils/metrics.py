@@ -0,0 +1,92 @@
+from collections import OrderedDict
+import tensorflow as tf
+
+# Cost classes of the metrics
+#: A cheap scalar, e.g. a loss or a global norm
+SCALAR = "scalar"
+#: One value per layer (or per weight)
+PER_LAYER = "per_layer"
+
+
+class Metric(object):
+    """
+    A metric computed in the graph
+
+    :param str name: Name of the metric, also used as the summary tag
+    :param tensor: The scalar tensor of the metric
+    :param str cost: Cost class of the metric
+    :param int interval: The metric is computed every `interval` training steps
+    :param bool with_train_op: Whether the metric is fetched in the same run as the train op.
+        Otherwise, it is computed in a separate run, before training.
+    :param str group: Group of the metric, i.e. the train op it is associated with
+    """
+    def __init__(self, name, tensor, cost=SCALAR, interval=1, with_train_op=True, group=None):
+        self.name = name
+        self.tensor = tensor
+        self.cost = cost
+        self.interval = interval
+        self.with_train_op = with_train_op
+        self.group = group
+
+
+class MetricsRegistry(object):
+    """
+    A registry of the metrics of an agent, deciding which ones are computed at each training step
+
+    Only the metrics of the enabled cost classes are computed during training.
+    Any metric can still be computed on demand with :meth:`evaluate`.
+
+    :param enabled_costs: The cost classes computed during training
+    """
+    def __init__(self, enabled_costs=(SCALAR, )):
+        self.metrics = OrderedDict()
+        self.enabled_costs = set(enabled_costs)
+        # (group, with_train_op) -> enabled metrics
+        self._enabled = {}
+
+    def register(self, name, tensor, **kwargs):
+        """Register a metric (see :class:`Metric` for the parameters)"""
+        self.metrics[name] = Metric(name, tensor, **kwargs)
+        self._enabled = {}
+
+    def enable(self, cost):
+        """Compute the metrics of a cost class during training"""
+        self.enabled_costs.add(cost)
+        self._enabled = {}
+
+    def disable(self, cost):
+        """Stop computing the metrics of a cost class during training"""
+        self.enabled_costs.discard(cost)
+        self._enabled = {}
+
+    def due(self, group, step, with_train_op):
+        """
+        Get the metrics of a group to compute at a training step
+
+        :param bool with_train_op: Get the metrics fetched with the train op, or the ones computed before
+        :return: A list of :class:`Metric`
+        """
+        key = (group, with_train_op)
+        if key not in self._enabled:
+            self._enabled[key] = [
+                metric for metric in self.metrics.values()
+                if metric.group == group and metric.with_train_op == with_train_op and metric.cost in self.enabled_costs
+            ]
+        return ([metric for metric in self._enabled[key] if step % metric.interval == 0])
+
+    def evaluate(self, session, feed_dict, names=None, group=None):
+        """
+        Compute metrics on demand
+
+        :param names: Names of the metrics. If None, all the metrics (of the group, if given).
+        :return: A dictionary of the values
+        """
+        if names is None:
+            names = [name for name, metric in self.metrics.items() if group is None or metric.group == group]
+        values = session.run([self.metrics[name].tensor for name in names], feed_dict=feed_dict)
+        return (dict(zip(names, values)))
+
+
+def to_summary(values):
+    """Create a single summary of a dictionary of scalar values"""
+    return (tf.Summary(value=[tf.Summary.Value(tag=name, simple_value=float(value)) for name, value in values.items()]))
@@ -33,11 +33,15 @@ def clone_optimizer(optimizer):
 
 
 def get_soft_target_model_ops(target_weights, source_weights, tau):
+    """
+    Create a single op moving the target weights towards the source weights:
+    `target = tau * target + (1 - tau) * source`, `tau` being the fraction of the target weights kept
+    """
     ops = []
     for (target_weight, source_weight) in zip(target_weights, source_weights):
         ops.append(tf.assign(target_weight, tau * target_weight + (1. - tau) * source_weight))
 
-    return(ops)
+    return(tf.group(*ops))
 
 
 def get_soft_target_model_updates(target, source, tau):
@@ -0,0 +1,186 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from rl.random import get_generator
+
+
+def _reserve(array, size):
+    """Return `array`, or a copy with a capacity of at least `size` rows (doubling the capacity)"""
+    if size <= array.shape[0]:
+        return (array)
+    capacity = max(size, 2 * array.shape[0])
+    grown = np.empty((capacity, ) + array.shape[1:], dtype=array.dtype)
+    grown[:array.shape[0]] = array
+    return (grown)
+
+
+class OutcomeIndex(object):
+    """
+    An incrementally updatable index of points, for k nearest neighbours queries
+
+    The points are indexed by a logarithmic number of KD-trees over consecutive ranges of points, of decreasing sizes.
+    The last points added (at most `min_tail`) are searched by brute force until they fill a new tree,
+    which is merged with the previous trees of similar sizes (as in a binary counter).
+    The insertions and the queries are hence both polylogarithmic (amortized).
+
+    :param int dim: Dimension of the points
+    :param int min_tail: Number of points searched by brute force before being indexed in a tree
+    :param int leafsize: Leaf size of the KD-trees
+    """
+    def __init__(self, dim, min_tail=256, leafsize=16):
+        self.dim = dim
+        self.min_tail = min_tail
+        self.leafsize = leafsize
+        self.points = np.empty((1024, dim))
+        self.size = 0
+        # List of (first point, tree)
+        self.trees = []
+        # Number of points in the trees (the first ones)
+        self.nb_indexed = 0
+
+    def __len__(self):
+        return (self.size)
+
+    def add(self, point):
+        """
+        Add a point
+
+        :return: The index of the point
+        """
+        return (self.extend(np.reshape(point, (1, self.dim)))[0])
+
+    def extend(self, points):
+        """
+        Add a batch of points, of shape `(nb_points, dim)`
+
+        :return: The indexes of the points
+        """
+        points = np.asarray(points, dtype=float).reshape((-1, self.dim))
+        self.points = _reserve(self.points, self.size + len(points))
+        idxs = np.arange(self.size, self.size + len(points))
+        self.points[idxs] = points
+        self.size += len(points)
+
+        if self.size - self.nb_indexed >= self.min_tail:
+            self._index_tail()
+        return (idxs)
+
+    def _index_tail(self):
+        """Index the points not in a tree, merging the trees smaller than twice the new one"""
+        first = self.nb_indexed
+        for tree_first, tree in reversed(self.trees):
+            if tree.n >= 2 * (self.size - first):
+                break
+            first = tree_first
+        self.trees = [(tree_first, tree) for tree_first, tree in self.trees if tree_first < first]
+        # The trees keep a reference to their data, which must not be modified: copy it
+        self.trees.append((first, cKDTree(self.points[first:self.size].copy(), leafsize=self.leafsize)))
+        self.nb_indexed = self.size
+
+    def rebuild(self):
+        """Index all the points in a single tree"""
+        self.trees = []
+        if self.size > 0:
+            self.trees.append((0, cKDTree(self.points[:self.size].copy(), leafsize=self.leafsize)))
+        self.nb_indexed = self.size
+
+    def query(self, points, k=1):
+        """
+        Find the k nearest neighbours of points
+
+        :param points: A point of shape `(dim,)`, or a batch of shape `(nb_points, dim)`
+        :param int k: Number of neighbours (at most the number of points in the index)
+        :return: The distances and the indexes of the neighbours, sorted by distance,
+            of shape `(k,)` for a single point or `(nb_points, k)` for a batch
+        """
+        if self.size == 0:
+            raise (IndexError("The index is empty"))
+        points = np.asarray(points, dtype=float)
+        single = (points.ndim == 1)
+        points = points.reshape((-1, self.dim))
+        k = min(k, self.size)
+
+        candidates_distances = []
+        candidates_idxs = []
+        for first, tree in self.trees:
+            k_tree = min(k, tree.n)
+            distances, idxs = tree.query(points, k=k_tree)
+            candidates_distances.append(np.reshape(distances, (len(points), k_tree)))
+            candidates_idxs.append(np.reshape(idxs, (len(points), k_tree)) + first)
+        if self.size > self.nb_indexed:
+            # Brute force on the points not yet in a tree
+            tail = self.points[self.nb_indexed:self.size]
+            distances = np.sqrt(np.sum((points[:, np.newaxis, :] - tail[np.newaxis, :, :])**2, axis=-1))
+            k_tail = min(k, len(tail))
+            idxs = np.argpartition(distances, k_tail - 1, axis=1)[:, :k_tail]
+            candidates_distances.append(np.take_along_axis(distances, idxs, axis=1))
+            candidates_idxs.append(idxs + self.nb_indexed)
+
+        # Merge the candidates
+        distances = np.concatenate(candidates_distances, axis=1)
+        idxs = np.concatenate(candidates_idxs, axis=1)
+        order = np.argsort(distances, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        idxs = np.take_along_axis(idxs, order, axis=1)
+        if single:
+            return (distances[0], idxs[0])
+        return (distances, idxs)
+
+
+class NearestNeighborModel(object):
+    """
+    A sensorimotor model for :class:`rl.agents.gep.GEPAgent`, predicting the policy reaching a goal from the nearest stored outcomes
+
+    :param int outcome_dim: Dimension of the outcomes (and goals)
+    :param int k: Number of neighbours. The predicted policy is the mean of their policies, weighted by the inverse of their distance to the goal.
+    :param float sigma_explo: Standard deviation of the gaussian noise added to the predicted policies in "explore" mode
+    :param seed: Seed of the random generator of the exploration noise (see :func:`rl.random.get_generator`)
+    """
+    def __init__(self, outcome_dim, k=1, sigma_explo=0.1, seed=None, **kwargs):
+        self.index = OutcomeIndex(outcome_dim, **kwargs)
+        self.k = k
+        self.sigma_explo = sigma_explo
+        self.random_state = get_generator(seed)
+        # "explore" or "exploit", set by the agent
+        self.mode = "explore"
+        # Allocated at the first update, once the shape of the policies is known
+        self.policies = None
+
+    def __len__(self):
+        return (len(self.index))
+
+    def seed(self, seed=None):
+        """Replace the random generator of the model (see :func:`rl.random.get_generator`)"""
+        self.random_state = get_generator(seed)
+
+    def update(self, policy, outcome):
+        """Store a policy and its outcome"""
+        self.update_batch([policy], [outcome])
+
+    def update_batch(self, policies, outcomes):
+        """Store a batch of policies and their outcomes"""
+        policies = np.asarray(policies, dtype=float)
+        if self.policies is None:
+            self.policies = np.empty((1024, ) + policies.shape[1:])
+        idxs = self.index.extend(outcomes)
+        self.policies = _reserve(self.policies, len(self.index))
+        self.policies[idxs] = policies
+
+    def inverse_prediction(self, goal):
+        """
+        Predict the policy reaching a goal
+
+        :param goal: A goal of shape `(outcome_dim,)`, or a batch of goals of shape `(nb_goals, outcome_dim)`
+        :return: The policy, or the batch of policies
+        """
+        distances, idxs = self.index.query(goal, k=self.k)
+        if self.k == 1:
+            policies = self.policies[idxs[..., 0]]
+        else:
+            weights = 1. / np.maximum(distances, 1e-12)
+            weights /= np.sum(weights, axis=-1, keepdims=True)
+            weights = weights.reshape(weights.shape + (1, ) * (self.policies.ndim - 1))
+            policies = np.sum(weights * self.policies[idxs], axis=0 if np.ndim(goal) == 1 else 1)
+        if self.mode == "explore":
+            policies = policies + self.sigma_explo * self.random_state.standard_normal(policies.shape)
+        return (policies)
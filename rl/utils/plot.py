@@ -99,9 +99,13 @@ def plot_trajectory(trajectory, actor, env, figure=None, figure_file="trajectory
     plt.close()
 
 
-def plot_distribution(actor, critic, env, actor_file="actor_distribution.png", critic_file="critic_distribution.png"):
-    """Plot the distributions of the network values"""
-    actor_actions, critic_values = network_values(env, actor, critic)
+def plot_distribution(actor, critic, env, actor_file="actor_distribution.png", critic_file="critic_distribution.png", seed=None):
+    """
+    Plot the distributions of the network values
+
+    :param seed: Seed of the random states and actions the networks are evaluated on (see :func:`rl.utils.stats.network_values`)
+    """
+    actor_actions, critic_values = network_values(env, actor, critic, seed=seed)
 
     plot_action_distribution(actor_actions, actor_file)
     plot_value_distribution(critic_values, critic_file)
@@ -0,0 +1,165 @@
+import threading
+import timeit
+from collections import deque
+
+import numpy as np
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class InferenceRequest(object):
+    """A state waiting for its action, returned by :meth:`InferenceServer.submit`"""
+    __slots__ = ("state", "time", "event", "action", "error")
+
+    def __init__(self, state):
+        self.state = state
+        self.time = timeit.default_timer()
+        self.event = threading.Event()
+        self.action = None
+        self.error = None
+
+    def done(self):
+        return (self.event.is_set())
+
+    def result(self, timeout=None):
+        """
+        Wait for the action
+
+        :raises: The error raised by the prediction, if any, or a RuntimeError after `timeout` seconds
+        """
+        if not self.event.wait(timeout):
+            raise (RuntimeError("No action after {}s".format(timeout)))
+        if self.error is not None:
+            raise (self.error)
+        return (self.action)
+
+
+class InferenceServer(object):
+    """
+    Serve the actions of a policy to many concurrent environment loops (e.g. threads), by micro-batches
+
+    The requests are coalesced in a background thread: a batch is run when it holds `max_batch_size` states,
+    or when its oldest request has waited for `max_latency` seconds.
+    Each batch is a single call to `predict`, e.g. :meth:`rl.agents.ddpg.DDPGAgent.select_actions`,
+    :meth:`rl.utils.export.FrozenActor.predict` or :meth:`rl.utils.inference.NumpyActor.predict`.
+
+    :param predict: Function computing a batch of actions from a batch of states (an array of shape `(batch_size, state_dim)`)
+    :param int max_batch_size: Maximal number of states of a batch
+    :param float max_latency: Maximal time (in seconds) a request waits for other requests before its batch is run
+    :param int stats_window: Number of requests (and batches) the latency (and batch size) statistics are computed on
+    """
+    def __init__(self, predict, max_batch_size=64, max_latency=1e-3, stats_window=10000):
+        self.predict_batch = predict
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.queue = queue.Queue()
+        self.closed = False
+        # Orders the submissions and the closing, so that no request is queued after the end of the queue
+        self.lock = threading.Lock()
+
+        # Statistics
+        self.nb_requests = 0
+        self.nb_batches = 0
+        self.latencies = deque(maxlen=stats_window)
+        self.batch_sizes = deque(maxlen=stats_window)
+        self.start_time = timeit.default_timer()
+
+        self.thread = threading.Thread(target=self._work, name="InferenceServer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, state):
+        """
+        Enqueue a state, without waiting for its action
+
+        :return: An :class:`InferenceRequest`
+        """
+        request = InferenceRequest(state)
+        with self.lock:
+            if self.closed:
+                raise (RuntimeError("The server is closed"))
+            self.queue.put(request)
+        return (request)
+
+    def predict(self, state):
+        """Get the action of a state, waiting for its batch to be run"""
+        return (self.submit(state).result())
+
+    def _work(self):
+        stop = False
+        while not stop:
+            request = self.queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = request.time + self.max_latency
+            # Gather the other requests until the batch is full or the deadline
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - timeit.default_timer()
+                try:
+                    if remaining > 0:
+                        request = self.queue.get(timeout=remaining)
+                    else:
+                        # Still take the requests already waiting
+                        request = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+            self._run(batch)
+
+    def _run(self, batch):
+        try:
+            actions = self.predict_batch(np.stack([request.state for request in batch]))
+        except Exception as error:
+            for request in batch:
+                request.error = error
+        else:
+            for request, action in zip(batch, actions):
+                request.action = action
+
+        now = timeit.default_timer()
+        for request in batch:
+            request.event.set()
+            self.latencies.append(now - request.time)
+        self.nb_requests += len(batch)
+        self.nb_batches += 1
+        self.batch_sizes.append(len(batch))
+
+    def stats(self):
+        """
+        Statistics of the served requests
+
+        :return: A dictionary of the number of requests and batches, the throughput (in requests per second),
+            the mean batch size, and the median and 99th percentile latencies (in milliseconds) of the last requests
+        """
+        latencies = 1e3 * np.array(self.latencies)
+        return ({
+            "nb_requests": self.nb_requests,
+            "nb_batches": self.nb_batches,
+            "requests_per_s": self.nb_requests / (timeit.default_timer() - self.start_time),
+            "mean_batch_size": np.mean(self.batch_sizes) if self.batch_sizes else 0.,
+            "latency_p50_ms": np.percentile(latencies, 50) if latencies.size else 0.,
+            "latency_p99_ms": np.percentile(latencies, 99) if latencies.size else 0.,
+        })
+
+    def close(self):
+        """Serve the pending requests, and stop the background thread"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            # End of the queue
+            self.queue.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return (self)
+
+    def __exit__(self, *args):
+        self.close()
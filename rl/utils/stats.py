@@ -1,9 +1,17 @@
 import numpy as np
 
+from rl.random import get_generator
 
-def network_values(env, actor, critic, definition=10000):
-    states = np.random.uniform(low=env.observation_space.low, high=env.observation_space.high, size=((definition, env.observation_space.dim)))
-    actions = np.random.uniform(low=env.action_space.low, high=env.action_space.high, size=((definition, env.action_space.dim)))
+
+def network_values(env, actor, critic, definition=10000, seed=None):
+    """
+    Evaluate the actor and the critic on random states and actions
+
+    :param seed: Seed of the random generator of the states and actions, or the generator itself (see :func:`rl.random.get_generator`)
+    """
+    random_state = get_generator(seed)
+    states = random_state.uniform(low=env.observation_space.low, high=env.observation_space.high, size=((definition, env.observation_space.dim)))
+    actions = random_state.uniform(low=env.action_space.low, high=env.action_space.high, size=((definition, env.action_space.dim)))
     distribution_actor = actor.predict_on_batch([states])[:, 0]
     distribution_critic = critic.predict_on_batch([states, actions])
 
@@ -0,0 +1,60 @@
+import multiprocessing
+
+# Replica of the current worker process, built by the initializer of the pool
+_replica = None
+
+
+def _initialize_worker(factory):
+    global _replica
+    _replica = factory()
+
+
+def _call_worker(args):
+    function, item = args
+    return function(_replica, item)
+
+
+class ReplicaPool(object):
+    """
+    A pool of worker processes, each holding its own replica of an expensive object (e.g. an environment, or an environment and a model).
+
+    Each replica is built once, in its worker process, by calling `factory`.
+    `factory` and the mapped functions must be picklable, e.g. defined at the top level of a module.
+
+    :param factory: Function without arguments returning a replica
+    :param int nb_processes: Number of worker processes. Defaults to the number of cores.
+    :param str start_method: Start method of the processes (see :mod:`multiprocessing`). Use "spawn" if the parent process already holds a Tensorflow session.
+    """
+    def __init__(self, factory, nb_processes=None, start_method=None):
+        if nb_processes is None:
+            nb_processes = multiprocessing.cpu_count()
+        self.nb_processes = nb_processes
+        if start_method is None:
+            # Python 2 has no contexts
+            context = multiprocessing
+        else:
+            context = multiprocessing.get_context(start_method)
+        self.pool = context.Pool(processes=nb_processes, initializer=_initialize_worker, initargs=(factory, ))
+
+    def map(self, function, items, chunksize=None):
+        """
+        Call `function(replica, item)` for each item, in the worker processes
+
+        :param function: Function taking a replica and an item
+        :param items: A sequence of items
+        :param int chunksize: Number of items sent at once to a worker. By default, each worker receives about 4 chunks.
+        :return: The list of the results, in the order of the items
+        """
+        if chunksize is None:
+            chunksize = max(1, len(items) // (4 * self.nb_processes))
+        return(self.pool.map(_call_worker, [(function, item) for item in items], chunksize=chunksize))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *args):
+        self.close()
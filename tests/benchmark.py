@@ -0,0 +1,359 @@
+"""
+Benchmarks of the framework overhead
+
+Run `python benchmark.py` to print the results as JSON, or `python benchmark.py --output results.json` to save them,
+e.g. to compare them between two commits.
+"""
+from __future__ import print_function
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import threading
+import timeit
+
+import numpy as np
+
+from rl.hooks.hook import Hook
+from rl.memory import SimpleMemory, Batch, Experience
+from rl.runtime.experiment import DefaultExperiment
+from fake_env import FakeEnv
+
+
+class StepCounterHook(Hook):
+    """A minimal hook, called at each step"""
+    def __init__(self, *args, **kwargs):
+        super(StepCounterHook, self).__init__(*args, **kwargs)
+        self.count = 0
+
+    def step_end(self):
+        self.count += 1
+
+
+def peak_rss():
+    """Peak resident set size of the process, in MB"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return (usage / 2.**20)
+    return (usage / 2.**10)
+
+
+def random_batch(nb_experiences, observation_dim, action_dim):
+    return (Batch(
+        state0=np.random.uniform(size=(nb_experiences, observation_dim)),
+        action=np.random.uniform(size=(nb_experiences, action_dim)),
+        reward=np.random.uniform(size=(nb_experiences, 1)),
+        state1=np.random.uniform(size=(nb_experiences, observation_dim)),
+        terminal1=np.zeros((nb_experiences, 1), dtype=bool)))
+
+
+def step_overhead(nb_steps=100000, callback=False, hooks=None, observation_dim=4):
+    """
+    Time per step (in microseconds) of :func:`RLAgent._run`, with a no-op agent on a zero-cost environment
+
+    :param bool callback: Add a minimal callback, called at each step
+    """
+    # Imported here, so that the other benchmarks do not need Keras
+    from rl.agents.rlagent import RLAgent
+    from rl.callbacks import Callback
+
+    class NoOpAgent(RLAgent):
+        """An agent always taking the same action, and not learning"""
+        def __init__(self, env, **kwargs):
+            super(NoOpAgent, self).__init__(**kwargs)
+            self.env = env
+            self.null_action = np.zeros(env.action_space.dim)
+            self.compiled = True
+
+        def forward(self, observation):
+            return self.null_action
+
+        def backward(self):
+            pass
+
+    class StepCounter(Callback):
+        """A minimal callback consuming the step events"""
+        def __init__(self):
+            self.count = 0
+
+        def on_step_end(self, step, logs={}):
+            self.count += 1
+
+    callbacks = [StepCounter()] if callback else None
+    env = FakeEnv(observation_dim=observation_dim)
+    agent = NoOpAgent(env, experiment=DefaultExperiment(use_tf=False, path="/tmp/experiments"), hooks=hooks)
+    start = timeit.default_timer()
+    agent.train(env=env, nb_steps=nb_steps, verbose=0, callbacks=callbacks)
+    duration = timeit.default_timer() - start
+    return (1e6 * duration / nb_steps)
+
+
+def memory_latency(limit, observation_dim, action_dim=1, batch_size=32, nb_operations=10000, storage_dtype="float32"):
+    """
+    Time (in microseconds) of :meth:`SimpleMemory.append` and :meth:`SimpleMemory.sample` in a full memory
+
+    :return: The append and sample times, and the size of the memory in bytes
+    """
+    env = FakeEnv(observation_dim=observation_dim, action_dim=action_dim)
+    memory = SimpleMemory(env=env, limit=limit, storage_dtype=storage_dtype)
+    memory.extend(random_batch(limit, observation_dim, action_dim))
+    experience = Experience(np.random.uniform(size=observation_dim), np.random.uniform(size=action_dim), 0.,
+                            np.random.uniform(size=observation_dim), False)
+
+    start = timeit.default_timer()
+    for _ in range(nb_operations):
+        memory.append(experience)
+    append = 1e6 * (timeit.default_timer() - start) / nb_operations
+
+    start = timeit.default_timer()
+    for _ in range(nb_operations // 10):
+        memory.sample(batch_size)
+    sample = 1e6 * (timeit.default_timer() - start) / (nb_operations // 10)
+    return (append, sample, memory.nbytes)
+
+
+def _shared_memory_writer(memory, shard, experience, nb_experiences):
+    memory.select_shard(shard)
+    for _ in range(nb_experiences):
+        memory.append(experience)
+    memory.close()
+
+
+def shared_memory_throughput(nb_writers, locks, nb_experiences=20000, observation_dim=16, batch_size=32):
+    """
+    Throughput of writer processes appending to a :class:`SharedMemory`, one shard each, while the main process samples batches
+
+    :return: The appends per second (of all the writers), and the time (in microseconds) of a sample
+    """
+    # Imported here, since it needs Python >= 3.8
+    from rl.shared_memory import SharedMemory
+
+    env = FakeEnv(observation_dim=observation_dim)
+    memory = SharedMemory(env=env, limit=100000, nb_shards=nb_writers, locks=locks)
+    experience = Experience(np.random.uniform(size=observation_dim), np.random.uniform(size=1), 0.,
+                            np.random.uniform(size=observation_dim), False)
+    memory.extend(random_batch(batch_size, observation_dim, 1))
+
+    writers = [multiprocessing.Process(target=_shared_memory_writer, args=(memory, shard, experience, nb_experiences))
+               for shard in range(nb_writers)]
+    start = timeit.default_timer()
+    for writer in writers:
+        writer.start()
+    nb_samples = 0
+    sample_duration = 0.
+    while any(writer.is_alive() for writer in writers):
+        sample_start = timeit.default_timer()
+        memory.sample(batch_size)
+        sample_duration += timeit.default_timer() - sample_start
+        nb_samples += 1
+    for writer in writers:
+        writer.join()
+    duration = timeit.default_timer() - start
+    memory.unlink()
+    return (nb_writers * nb_experiences / duration, 1e6 * sample_duration / max(nb_samples, 1))
+
+
+def ddpg_update_latency(batch_size, observation_dim=16, nb_updates=200):
+    """Time (in milliseconds) of a training step of the actor and the critic of DDPG"""
+    # Imported here, so that the other benchmarks do not need Tensorflow
+    from rl.agents.ddpg import DDPGAgent
+    from rl.utils.env import populate_env
+    from rl.utils.networks import simple_actor, simple_critic
+
+    env = populate_env(FakeEnv(observation_dim=observation_dim))
+    memory = SimpleMemory(env=env, limit=max(10000, batch_size))
+    memory.extend(random_batch(memory.limit, observation_dim, env.action_space.dim))
+    agent = DDPGAgent(actor=simple_actor(env), critic=simple_critic(env), env=env, memory=memory, batch_size=batch_size)
+    agent.compile()
+    # The summaries of the steps are reset by the training loops, which are not run here
+    agent.step_summaries = []
+    # Warm up
+    agent.fit_controllers()
+
+    start = timeit.default_timer()
+    for _ in range(nb_updates):
+        agent.step_summaries = []
+        agent.fit_controllers()
+    return (1e3 * (timeit.default_timer() - start) / nb_updates)
+
+
+def actor_latency(observation_dim=16, nb_calls=1000, batch_sizes=(1, 32, 256)):
+    """
+    Time (in microseconds) of the inference of a DDPG actor, through :meth:`DDPGAgent.select_action` (one state at a time),
+    a frozen graph (:class:`rl.utils.export.FrozenActor`), and NumPy (:class:`rl.utils.inference.NumpyActor`)
+    """
+    from rl.agents.ddpg import DDPGAgent
+    from rl.utils.env import populate_env
+    from rl.utils.export import export_actor, numpy_actor, FrozenActor
+    from rl.utils.networks import simple_actor, simple_critic
+
+    env = populate_env(FakeEnv(observation_dim=observation_dim))
+    agent = DDPGAgent(actor=simple_actor(env), critic=simple_critic(env), env=env,
+                      memory=SimpleMemory(env=env, limit=1000))
+    agent.compile()
+    agent.training = agent.exploration = False
+
+    export_actor(agent.actor, "/tmp/benchmark_actor", session=agent.session)
+    frozen = FrozenActor("/tmp/benchmark_actor")
+    numpy_runner = numpy_actor(agent.actor)
+
+    state = np.random.uniform(size=observation_dim)
+    start = timeit.default_timer()
+    for _ in range(nb_calls):
+        agent.select_action(state)
+    results = [{"runner": "select_action", "batch_size": 1, "us_per_call": 1e6 * (timeit.default_timer() - start) / nb_calls}]
+    for batch_size in batch_sizes:
+        states = np.random.uniform(size=(batch_size, observation_dim))
+        for name, runner in (("frozen", frozen), ("numpy", numpy_runner)):
+            runner.predict(states)
+            start = timeit.default_timer()
+            for _ in range(nb_calls):
+                runner.predict(states)
+            results.append({"runner": name, "batch_size": batch_size, "us_per_call": 1e6 * (timeit.default_timer() - start) / nb_calls})
+    frozen.close()
+    return (results)
+
+
+def serving_throughput(nb_clients, nb_requests=2000, observation_dim=16, max_batch_size=64, max_latency=1e-3):
+    """
+    Throughput and latency of an :class:`InferenceServer` of a NumPy actor, with `nb_clients` threads requesting actions in a loop
+
+    :return: The statistics of the server (see :meth:`InferenceServer.stats`)
+    """
+    from rl.utils.inference import NumpyActor
+    from rl.utils.serving import InferenceServer
+
+    actor = NumpyActor([(np.random.normal(size=(observation_dim, 64)), np.zeros(64), "relu"),
+                        (np.random.normal(size=(64, 1)), np.zeros(1), "tanh")])
+    state = np.random.uniform(size=observation_dim)
+    if nb_clients == 0:
+        # Baseline: one call per state, without server
+        start = timeit.default_timer()
+        for _ in range(nb_requests):
+            actor.predict(state[np.newaxis])
+        duration = timeit.default_timer() - start
+        return ({"requests_per_s": nb_requests / duration, "latency_p50_ms": 1e3 * duration / nb_requests})
+
+    with InferenceServer(actor.predict, max_batch_size=max_batch_size, max_latency=max_latency) as server:
+        def client():
+            for _ in range(nb_requests):
+                server.predict(state)
+        clients = [threading.Thread(target=client) for _ in range(nb_clients)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        return (server.stats())
+
+
+def nearest_neighbors(nb_points, dim=2, nb_queries=100, batch_size=100):
+    """
+    Time (in microseconds) of the insertions and 1-NN queries of an :class:`OutcomeIndex` filled by batches of `batch_size` points,
+    and of a query by linear scan, as in a GEP run
+    """
+    # Imported here, so that the other benchmarks do not need Scipy
+    from rl.utils.neighbors import OutcomeIndex
+
+    points = np.random.uniform(size=(nb_points, dim))
+    queries = np.random.uniform(size=(nb_queries, dim))
+    index = OutcomeIndex(dim)
+
+    start = timeit.default_timer()
+    for i in range(0, nb_points, batch_size):
+        index.extend(points[i:i + batch_size])
+    insertion = 1e6 * (timeit.default_timer() - start) / nb_points
+
+    start = timeit.default_timer()
+    for query in queries:
+        index.query(query)
+    query_time = 1e6 * (timeit.default_timer() - start) / nb_queries
+
+    start = timeit.default_timer()
+    for query in queries:
+        np.argmin(np.sum((points - query)**2, axis=1))
+    scan_time = 1e6 * (timeit.default_timer() - start) / nb_queries
+    return (insertion, query_time, scan_time)
+
+
+def run(sections, max_memory_bytes=2**30):
+    results = {}
+
+    if "loop" in sections:
+        results["loop"] = []
+        for observation_dim in (4, 1024):
+            step_time = step_overhead(observation_dim=observation_dim)
+            results["loop"].append({"observation_dim": observation_dim, "us_per_step": step_time, "steps_per_s": 1e6 / step_time})
+        results["peak_rss_mb_after_loop"] = peak_rss()
+
+    if "callbacks" in sections:
+        base = step_overhead()
+        results["callbacks"] = {
+            "us_per_step": base,
+            "callback_us_per_step": step_overhead(callback=True) - base,
+            "hook_us_per_step": step_overhead(hooks=[StepCounterHook(agent_id="all")]) - base
+        }
+
+    if "memory" in sections:
+        results["memory"] = []
+        for limit in (10000, 100000, 1000000):
+            for observation_dim in (4, 64, 512):
+                # Two float32 observation columns
+                if 2 * 4 * limit * observation_dim > max_memory_bytes:
+                    continue
+                append, sample, _ = memory_latency(limit, observation_dim)
+                results["memory"].append({"limit": limit, "observation_dim": observation_dim, "append_us": append, "sample_us": sample})
+        results["peak_rss_mb_after_memory"] = peak_rss()
+
+        # Storage dtypes of the observations
+        results["memory_storage"] = []
+        for storage_dtype in ("float64", "float32", "float16", "uint8"):
+            append, sample, nbytes = memory_latency(100000, 64, storage_dtype=storage_dtype)
+            results["memory_storage"].append({"storage_dtype": storage_dtype, "append_us": append, "sample_us": sample, "mb": nbytes / 2.**20})
+
+    if "shared_memory" in sections:
+        results["shared_memory"] = []
+        for nb_writers in (1, 4, 16):
+            for locks in (False, True):
+                appends, sample = shared_memory_throughput(nb_writers, locks)
+                results["shared_memory"].append({"writers": nb_writers, "locks": locks, "appends_per_s": appends, "sample_us": sample})
+
+    if "ddpg" in sections:
+        results["ddpg"] = []
+        for batch_size in (32, 128, 512):
+            results["ddpg"].append({"batch_size": batch_size, "update_ms": ddpg_update_latency(batch_size)})
+
+    if "actor" in sections:
+        results["actor"] = actor_latency()
+
+    if "serving" in sections:
+        results["serving"] = []
+        for nb_clients in (0, 1, 8, 32):
+            stats = serving_throughput(nb_clients)
+            stats["clients"] = nb_clients
+            results["serving"].append(stats)
+
+    if "neighbors" in sections:
+        results["neighbors"] = []
+        for nb_points in (10000, 100000, 1000000):
+            insertion, query, scan = nearest_neighbors(nb_points)
+            results["neighbors"].append({"nb_points": nb_points, "insertion_us": insertion, "query_us": query, "linear_scan_us": scan})
+
+    results["peak_rss_mb"] = peak_rss()
+    return (results)
+
+
+if __name__ == "__main__":
+    all_sections = ["loop", "callbacks", "memory", "shared_memory", "ddpg", "actor", "serving", "neighbors"]
+    parser = argparse.ArgumentParser(description="Benchmark the framework overhead")
+    parser.add_argument("--sections", nargs="+", choices=all_sections, default=all_sections)
+    parser.add_argument("--output", help="Path of the JSON results. By default, they are printed.")
+    args = parser.parse_args()
+
+    results = run(args.sections)
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(args.output, "w") as fd:
+            json.dump(results, fd, indent=2)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import numpy as np
+
+from rl.agents.rlagent import RLAgent
+from rl.callbacks import ModelIntervalCheckpoint
+from rl.runtime.experiment import DefaultExperiment
+from rl.utils.checkpoint import CheckpointStore, load_checkpoint
+from fake_env import FakeEnv
+
+
+class IdleAgent(RLAgent):
+    """An agent doing nothing, without weights"""
+    def __init__(self, env, **kwargs):
+        super(IdleAgent, self).__init__(**kwargs)
+        self.null_action = np.zeros(env.action_space.dim)
+        self.compiled = True
+
+    def forward(self, observation):
+        return self.null_action
+
+    def backward(self):
+        pass
+
+
+class WeightedAgent(IdleAgent):
+    """An agent whose weights are its number of steps"""
+    def get_weights(self):
+        return ({"model": [np.array([self.step])]})
+
+
+directory = "/tmp/experiments/checkpoints"
+if os.path.exists(directory):
+    shutil.rmtree(directory)
+env = FakeEnv(episode_length=50)
+experiment = DefaultExperiment(use_tf=False, path="/tmp/experiments")
+
+# Asynchronous checkpoints need get_weights, checked before the first step
+callback = ModelIntervalCheckpoint(directory, interval=10, asynchronous=True)
+agent = IdleAgent(env, experiment=experiment)
+try:
+    agent.train(env=env, nb_steps=10, verbose=0, callbacks=[callback])
+    raise AssertionError("An agent without get_weights was accepted")
+except ValueError:
+    pass
+callback.manager.close()
+
+# The writer thread is stopped at the end of each run, and started again by the next one
+callback = ModelIntervalCheckpoint(directory, interval=10, asynchronous=True, max_to_keep=3)
+agent = WeightedAgent(env, experiment=experiment, name="weighted")
+for run in range(2):
+    agent.train(env=env, nb_steps=30, verbose=0, callbacks=[callback])
+    assert not callback.manager.thread.is_alive()
+assert len(callback.manager.checkpoints) == 3
+weights, metadata = load_checkpoint(callback.manager.latest)
+assert metadata["step"] == 60
+assert weights["model"][0][0] == 60
+assert len(os.listdir(directory)) == 2 * 3
+
+# The checkpoints spilled to disk are removed with the store
+store = CheckpointStore(memory_budget=1000)
+for name in ("initial", "checkpoint-1", "best"):
+    store.put(name, {"actor": [np.ones(100)], "critic": [np.ones(50)]})
+spill_directory = store.directory
+assert len(os.listdir(spill_directory)) > 0
+assert np.array_equal(store.get("initial")["actor"][0], np.ones(100))
+# The order of creation is kept, whatever the order of use
+assert store.history == ["initial", "checkpoint-1", "best"]
+store.put("checkpoint-1", {"actor": [np.zeros(1)]})
+assert store.history == ["initial", "best", "checkpoint-1"]
+assert store.nb_created == 4
+store.close()
+assert not os.path.exists(spill_directory)
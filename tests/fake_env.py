@@ -0,0 +1,45 @@
+import numpy as np
+import gym.spaces
+
+
+class FakeEnv(object):
+    """
+    A zero-cost environment, used to measure the overhead of the framework itself.
+    Every step returns a constant observation, a null reward, and terminates after `episode_length` steps.
+
+    :param int observation_dim: Dimension of the observations
+    :param int action_dim: Dimension of the actions
+    :param int episode_length: Number of steps of an episode
+    :param bool inplace: Return the same observation array at each step, updated in place, instead of a new one
+    """
+    def __init__(self, observation_dim=4, action_dim=1, episode_length=200, inplace=False):
+        self.observation_space = gym.spaces.Box(low=-np.ones(observation_dim), high=np.ones(observation_dim))
+        self.action_space = gym.spaces.Box(low=-np.ones(action_dim), high=np.ones(action_dim))
+        # Same metadata as rl.utils.env.populate_env, without the keras placeholders
+        self.observation_space.dim = observation_dim
+        self.action_space.dim = action_dim
+
+        self.episode_length = episode_length
+        self.inplace = inplace
+        self.observation = np.zeros(observation_dim)
+        self.episode_step = 0
+
+    def reset(self):
+        self.episode_step = 0
+        self.observation[:] = 0.
+        return self._observation()
+
+    def step(self, action):
+        self.episode_step += 1
+        self.observation[0] = self.episode_step
+        done = (self.episode_step >= self.episode_length)
+        return (self._observation(), 0., done, {})
+
+    def _observation(self):
+        if self.inplace:
+            return self.observation
+        else:
+            return self.observation.copy()
+
+    def render(self, mode="human"):
+        pass
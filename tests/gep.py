@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+from rl.agents.gep import GEPAgent
+from rl.hooks.gep import GEPHook, RunGEPHook
+from rl.runtime.experiment import DefaultExperiment
+from rl.utils.neighbors import NearestNeighborModel
+
+
+class FakeGEPEnv(object):
+    """A GEP environment whose outcome is a linear function of the motor command"""
+    rollout_size = 10
+
+    def __init__(self):
+        self.random_state = np.random.RandomState(0)
+        self.matrix = self.random_state.normal(size=(4, 2))
+
+    def random_motors(self, n=1):
+        return (self.random_state.uniform(-1., 1., size=(n, 4)))
+
+    def compute_sensori_effect(self, policy, hooks=None, **kwargs):
+        achievement = np.dot(policy, self.matrix)
+        return (achievement, -np.linalg.norm(achievement))
+
+
+def make_env():
+    return (FakeGEPEnv())
+
+
+class GoalModel(object):
+    def sample(self):
+        return (np.zeros(2))
+
+
+# Test a batch of goals with the GEP hooks attached, on an agent which has never been run
+experiment = DefaultExperiment(use_tf=False, path="/tmp/experiments", hooks=[GEPHook(), RunGEPHook()])
+agent = GEPAgent(FakeGEPEnv(), NearestNeighborModel(2), GoalModel(), experiment=experiment)
+agent.bootstrap(20)
+
+goals = np.random.uniform(-1., 1., size=(5, 2))
+errors = agent.test_goals(goals)
+assert errors.shape == (5, )
+
+batch_path = experiment.endpoint("data/collected") + "batch_{}.p".format(agent.episode)
+assert os.path.exists(batch_path)
+batch = pd.read_pickle(batch_path)
+assert len(batch) == 5
+assert np.allclose(batch["errors"], errors)
+
+# The batch is not recorded as a run
+for hook in experiment.hooks:
+    assert len(hook.errors) == 0
+
+# The runs are still recorded
+agent.test(n_episodes=2)
+agent.test_goals(goals)
+for hook in experiment.hooks:
+    assert len(hook.errors) == (2 if type(hook) is GEPHook else 1)
+
+# Bootstrap in parallel: the hooks are notified of the whole batch of motor babbling
+experiment = DefaultExperiment(use_tf=False, path="/tmp/experiments", hooks=[GEPHook()])
+agent = GEPAgent(FakeGEPEnv(), NearestNeighborModel(2), GoalModel(), experiment=experiment)
+agent.bootstrap(20, env_fn=make_env, nb_processes=2)
+assert len(agent.model) == 20
+
+batch = pd.read_pickle(experiment.endpoint("data/collected") + "batch_{}.p".format(agent.episode))
+assert len(batch) == 20
+assert "goals" not in batch
+assert np.allclose(np.stack(batch["policies"]), agent.policies)
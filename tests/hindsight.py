@@ -0,0 +1,37 @@
+import numpy as np
+
+from rl.memory import Batch, HindsightMemory
+from fake_env import FakeEnv
+
+
+def episode_batch(episode, length, achieved_goal, desired_goal):
+    """An episode whose achieved goal at step `t` is `(100 * episode + t) * (1, 1)`, with a desired goal of -1"""
+    states = np.empty((length + 1, 4))
+    states[:, desired_goal] = -1.
+    states[:, achieved_goal] = (100 * episode + np.arange(length + 1))[:, np.newaxis]
+    return (Batch(state0=states[:-1], action=np.zeros((length, 1)), reward=np.zeros((length, 1)),
+                  state1=states[1:], terminal1=(np.arange(length) == length - 1)[:, np.newaxis]))
+
+
+def check_relabeling(achieved_goal, desired_goal):
+    reward_function = lambda achieved_goals, desired_goals: -np.abs(achieved_goals - desired_goals).sum(axis=1)
+    memory = HindsightMemory(FakeEnv(observation_dim=4), 1000, achieved_goal, desired_goal,
+                             relabel_fraction=1., reward_function=reward_function, seed=0)
+    for episode in range(5):
+        memory.extend(episode_batch(episode, 20, achieved_goal, desired_goal))
+
+    batch = memory.sample(64)
+    goals = batch.state0[:, desired_goal]
+    achieved0 = batch.state0[:, achieved_goal]
+    achieved1 = batch.state1[:, achieved_goal]
+    # The desired goal is a goal achieved later in the same episode, the achieved goals are left untouched
+    assert np.array_equal(batch.state1[:, desired_goal], goals)
+    assert np.all(goals[:, 0] == goals[:, 1])
+    assert np.all(goals[:, 0] // 100 == achieved0[:, 0] // 100)
+    assert np.all(goals[:, 0] > achieved0[:, 0])
+    assert np.all(achieved1[:, 0] == achieved0[:, 0] + 1)
+    assert np.allclose(batch.reward[:, 0], reward_function(achieved1, goals))
+
+
+check_relabeling(slice(0, 2), slice(2, 4))
+check_relabeling(np.array([0, 2]), np.array([1, 3]))
@@ -1 +1,4 @@
 from rl.agents.ddpg import DDPGAgent
+from rl.agents.dqn import DQNAgent, NAFAgent
+from rl.agents.sarsa import SARSAAgent
+from rl.agents.cem import CEMAgent
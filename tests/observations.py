@@ -0,0 +1,68 @@
+import numpy as np
+
+from rl.agents.rlagent import RLAgent
+from rl.memory import Experience, SimpleMemory
+from rl.runtime.experiment import DefaultExperiment
+from rl.utils.env import mutates_observations
+from fake_env import FakeEnv
+
+
+class RecordingAgent(RLAgent):
+    """An agent storing every transition in its memory, without learning"""
+    def __init__(self, env, **kwargs):
+        super(RecordingAgent, self).__init__(**kwargs)
+        self.memory = SimpleMemory(env=env, limit=1000)
+        self.null_action = np.zeros(env.action_space.dim)
+        self.compiled = True
+
+    def forward(self, observation):
+        return self.null_action
+
+    def backward(self):
+        self.memory.append(Experience(self.observation, self.action, self.reward, self.observation_1, self.done,
+                                      episode_start=(self.episode_step == 1)))
+
+
+def check_transitions(inplace, copy_observations):
+    """Whether the stored transitions are consistent: the end of a step is the beginning of the next one"""
+    env = FakeEnv(episode_length=50, inplace=inplace)
+    agent = RecordingAgent(env, experiment=DefaultExperiment(use_tf=False, path="/tmp/experiments"))
+    agent.train(env=env, nb_episodes=2, verbose=0, copy_observations=copy_observations)
+    batch = agent.memory.get_idxs(np.arange(len(agent.memory)), batch_size=len(agent.memory))
+    continuing = ~batch.terminal1[:-1, 0]
+    return np.array_equal(batch.state1[:-1][continuing], batch.state0[1:][continuing])
+
+
+# Detection of the environments reusing their observation arrays
+assert mutates_observations(FakeEnv(inplace=True))
+assert not mutates_observations(FakeEnv(inplace=False))
+
+# Observations passed by reference are only safe if the environment doesn't modify them
+assert check_transitions(inplace=False, copy_observations=False)
+assert check_transitions(inplace=True, copy_observations=True)
+assert not check_transitions(inplace=True, copy_observations=False)
+
+# By default, the observations are only copied by the memory, which copies them
+assert check_transitions(inplace=False, copy_observations=None)
+class RecordingEnv(FakeEnv):
+    """An environment keeping the last observation it returned"""
+    def step(self, action):
+        result = super(RecordingEnv, self).step(action)
+        self.last_observation = result[0]
+        return (result)
+
+
+env = RecordingEnv(episode_length=50)
+agent = RecordingAgent(env, experiment=DefaultExperiment(use_tf=False, path="/tmp/experiments"))
+agent.train(env=env, nb_steps=10, verbose=0)
+assert agent.observation_1 is env.last_observation
+
+# A run interrupted in the middle of an episode is not continued by the next one
+env = FakeEnv(episode_length=50)
+agent = RecordingAgent(env, experiment=DefaultExperiment(use_tf=False, path="/tmp/experiments"))
+agent.train(env=env, nb_steps=30, verbose=0)
+agent.train(env=env, nb_steps=30, verbose=0)
+assert np.array_equal(agent.memory.episode[:60], np.repeat([0, 1], 30))
+# The n-step returns are truncated at the end of the first run
+batch = agent.memory.sample_nstep(1, 5, 0.9, batch_idxs=[27])
+assert np.allclose(batch.discount, 0.9 ** 2)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from rl.agents.omniscient import OmniscientAgent
+from rl.memory import SimpleMemory
+from rl.runtime.experiment import DefaultExperiment
+from fake_env import FakeEnv
+
+
+class SettableEnv(FakeEnv):
+    """An environment whose state can be set, moving by the action at each step"""
+    def set_state(self, state):
+        self.observation[:] = state
+
+    def step(self, action):
+        self.observation += action
+        return (self._observation(), 0., False, {})
+
+
+class TimeLimit(object):
+    """A wrapper which must be reset before being stepped, and ends the episodes after `max_episode_steps` steps, as gym's one"""
+    def __init__(self, env, max_episode_steps=2):
+        self.env = env
+        self.observation_space = env.observation_space
+        self.action_space = env.action_space
+        self.max_episode_steps = max_episode_steps
+        self.elapsed_steps = None
+
+    def reset(self):
+        self.elapsed_steps = 0
+        return (self.env.reset())
+
+    def step(self, action):
+        assert self.elapsed_steps is not None, "Cannot call env.step() before calling reset()"
+        self.elapsed_steps += 1
+        observation, reward, done, info = self.env.step(action)
+        return (observation, reward, done or self.elapsed_steps >= self.max_episode_steps, info)
+
+
+def make_env():
+    return (TimeLimit(SettableEnv(observation_dim=2, action_dim=2)))
+
+
+if __name__ == "__main__":
+    env = make_env()
+    agent = OmniscientAgent(env, DefaultExperiment(use_tf=False, path="/tmp/experiments"))
+    for env_fn in (None, make_env):
+        memory = SimpleMemory(env=env, limit=1000)
+        agent.generate(100, memory=memory, chunk_size=30, env_fn=env_fn, nb_processes=2)
+        batch = memory.get_idxs(np.arange(len(memory)), batch_size=len(memory))
+        # Each transition starts from its own state, in a new episode
+        assert np.allclose(batch.state1, batch.state0 + batch.action, atol=1e-6)
+        assert not batch.terminal1.any()
+        assert len(np.unique(memory.episode[:len(memory)])) == len(memory)
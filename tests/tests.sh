@@ -8,3 +8,18 @@ python ddpg.py
 
 echo "Running experiment test"
 python experiment.py
+
+echo "Running observations test"
+python observations.py
+
+echo "Running hindsight memory test"
+python hindsight.py
+
+echo "Running omniscient agent test"
+python omniscient.py
+
+echo "Running GEP agent test"
+python gep.py
+
+echo "Running checkpoint test"
+python checkpoint.py